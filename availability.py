@@ -0,0 +1,283 @@
+import bisect
+from calendar_table import CALENDAR
+from collections.abc import Mapping, Sequence
+
+
+class IntervalSet:
+    """
+    Sorted, disjoint half-open ranges [start, end) of integers. Touching
+    ranges are merged, so the size only grows with the number of separate
+    ranges and never with their length.
+
+    >>> s = IntervalSet()
+    >>> s.add(10, 15)
+    >>> s.add(15, 20)
+    >>> s.add(30, 32)
+    >>> list(s)
+    [(10, 20), (30, 32)]
+    >>> s.overlaps(20, 30), s.overlaps(19, 21), s.covers(11, 20)
+    (False, True, True)
+    >>> s.remove(12, 31)
+    [(12, 20), (30, 31)]
+    >>> list(s)
+    [(10, 12), (31, 32)]
+    """
+    __slots__= ('starts', 'ends')
+
+    def __init__(self):
+        self.starts=[]
+        self.ends=[]
+
+    def __len__(self):
+        return len(self.starts)
+
+    def __iter__(self):
+        return iter(zip(self.starts, self.ends))
+
+    def __contains__(self, point):
+        return self.covers(point, point+1)
+
+    def overlaps(self, start, end):
+        i= bisect.bisect_right(self.ends, start)
+        return i<len(self.starts) and self.starts[i]<end
+
+    def covers(self, start, end):
+        i= bisect.bisect_right(self.starts, start)-1
+        return i>=0 and self.ends[i]>=end
+
+    def intersection(self, start, end):
+        lo= bisect.bisect_right(self.ends, start)
+        hi= bisect.bisect_left(self.starts, end)
+        pieces=[]
+
+        for i in range(lo, hi):
+            pieces.append((max(self.starts[i], start), min(self.ends[i], end)))
+
+        return pieces
+
+    def add(self, start, end):
+        lo= bisect.bisect_left(self.ends, start)
+        hi= bisect.bisect_right(self.starts, end)
+
+        if lo<hi:
+            start= min(start, self.starts[lo])
+            end= max(end, self.ends[hi-1])
+
+        self.starts[lo:hi]= [start]
+        self.ends[lo:hi]= [end]
+
+    def remove(self, start, end):
+        lo= bisect.bisect_right(self.ends, start)
+        hi= bisect.bisect_left(self.starts, end)
+
+        if lo>=hi:
+            return []
+
+        removed= self.intersection(start, end)
+        new_starts=[]
+        new_ends=[]
+
+        if self.starts[lo]<start:
+            new_starts.append(self.starts[lo])
+            new_ends.append(start)
+
+        if self.ends[hi-1]>end:
+            new_starts.append(end)
+            new_ends.append(self.ends[hi-1])
+
+        self.starts[lo:hi]= new_starts
+        self.ends[lo:hi]= new_ends
+
+        return removed
+
+
+class MonthAvailability(Sequence):
+    """
+    List-like view of one month of an Availability, laid out like the
+    original per-month lists: index 0 is None, index d is True when night d
+    is free.
+    """
+    __slots__= ('availability', 'first', 'days')
+
+    def __init__(self, availability, first, days):
+        self.availability= availability
+        self.first= first
+        self.days= days
+
+    def __len__(self):
+        return self.days+1
+
+    def __getitem__(self, day):
+        if isinstance(day, slice):
+            return list(self)[day]
+
+        if day<0:
+            day+= self.days+1
+
+        if day<0 or day>self.days:
+            raise IndexError("day out of range")
+
+        if day==0:
+            return None
+
+        return self.first+day-1 not in self.availability.booked
+
+    def __setitem__(self, day, free):
+        if day<0:
+            day+= self.days+1
+
+        if day<=0 or day>self.days:
+            raise IndexError("day out of range")
+
+        night= self.first+day-1
+
+        if free:
+            self.availability.release(night, night+1)
+
+        elif night not in self.availability.booked:
+            self.availability.reserve(night, night+1)
+
+    def __iter__(self):
+        yield None
+        night= self.first
+        end= self.first+self.days
+
+        for start, stop in self.availability.booked.intersection(night, end):
+
+            for _ in range(night, start):
+                yield True
+
+            for _ in range(start, stop):
+                yield False
+
+            night= stop
+
+        for _ in range(night, end):
+            yield True
+
+    def __repr__(self):
+        return repr(list(self))
+
+
+class Availability(Mapping):
+    """
+    Per-room availability kept as two interval sets over date ordinals: the
+    nights that have been set up (opened) and the nights that are booked.
+    Range checks, reservations and releases cost O(log bookings) regardless
+    of the length of the stay.
+
+    Indexing by (year, month) gives a MonthAvailability view so code written
+    against the old {(year, month): [None, True, ...]} layout keeps working.
+
+    Listeners are called as listener(start, end, delta) whenever nights in
+    [start, end) become free (delta 1) or stop being free (delta -1).
+
+    >>> a = Availability()
+    >>> a.set_up_month(2021, 5, 31)
+    >>> first = a.months[(2021, 5)][0]
+    >>> a.is_free(first+2, first+9)
+    True
+    >>> a.reserve(first+2, first+9)
+    >>> a.is_free(first+8, first+10), a[(2021, 5)][9], a[(2021, 5)][10]
+    (False, False, True)
+    >>> a.reserve(first+8, first+10)
+    Traceback (most recent call last):
+    AssertionError: The room is not available at the given dates
+    >>> [(s-first, e-first) for s, e in a.free_ranges()]
+    [(0, 2), (9, 31)]
+    >>> a.release(first+2, first+9)
+    >>> a.is_free(first, first+31), a.is_free(first, first+32)
+    (True, False)
+    >>> a.close_month(2021, 5)
+    >>> len(a), a.is_free(first, first+1)
+    (0, False)
+    """
+    __slots__= ('months', 'open', 'booked', 'listeners')
+
+    def __init__(self):
+        self.months={}
+        self.open=IntervalSet()
+        self.booked=IntervalSet()
+        self.listeners=[]
+
+    def __getstate__(self):
+        return {'months': self.months, 'open': self.open, 'booked': self.booked, 'listeners': []}
+
+    def __setstate__(self, state):
+        for key, value in state.items():
+            setattr(self, key, value)
+
+    def __getitem__(self, month_tuple):
+        first, days= self.months[month_tuple]
+        return MonthAvailability(self, first, days)
+
+    def __iter__(self):
+        return iter(self.months)
+
+    def __len__(self):
+        return len(self.months)
+
+    def __contains__(self, month_tuple):
+        return month_tuple in self.months
+
+    def notify(self, start, end, delta):
+        for listener in self.listeners:
+            listener(start, end, delta)
+
+    def set_up_month(self, year, month, days):
+        first= CALENDAR.month_start(year, month)
+        end= first+days
+
+        if (year, month) in self.months:
+            self.release(first, end)
+            return
+
+        self.months[(year, month)]= (first, days)
+        self.open.add(first, end)
+        self.notify(first, end, 1)
+
+    def close_month(self, year, month):
+        first, days= self.months.pop((year, month))
+        end= first+days
+        night= first
+
+        for start, stop in self.booked.remove(first, end):
+
+            if night<start:
+                self.notify(night, start, -1)
+
+            night= stop
+
+        if night<end:
+            self.notify(night, end, -1)
+
+        self.open.remove(first, end)
+
+    def free_ranges(self):
+        for open_start, open_end in self.open:
+            night= open_start
+
+            for start, stop in self.booked.intersection(open_start, open_end):
+
+                if night<start:
+                    yield night, start
+
+                night= stop
+
+            if night<open_end:
+                yield night, open_end
+
+    def is_free(self, start, end):
+        return self.open.covers(start, end) and not self.booked.overlaps(start, end)
+
+    def reserve(self, start, end):
+        if not self.is_free(start, end):
+            raise AssertionError("The room is not available at the given dates")
+
+        self.booked.add(start, end)
+        self.notify(start, end, -1)
+
+    def release(self, start, end):
+        for piece_start, piece_end in self.booked.remove(start, end):
+            self.notify(piece_start, piece_end, 1)
+
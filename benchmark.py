@@ -0,0 +1,303 @@
+import argparse
+import datetime
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import time
+import gc
+import tracemalloc
+from booking import Booking
+from gaps import STRATEGIES
+from generate_hotels import generate_hotel, ROOM_TYPES, STAY_LENGTHS
+from replay import ReplayDriver
+
+SIZES= [(100, 1), (500, 1), (500, 3), (2000, 3)]
+IMPORT_BUDGET= 0.25
+SEASON_STAYS= {1: 6, 2: 6, 3: 4, 4: 2, 7: 3, 14: 2, 21: 1}
+
+
+def parse_sizes(text):
+    """
+    >>> parse_sizes('100x1,500x3')
+    [(100, 1), (500, 3)]
+    """
+    sizes= []
+
+    for part in text.split(','):
+        rooms, years= part.lower().split('x')
+        sizes.append((int(rooms), int(years)))
+
+    return sizes
+
+
+def timings(seconds):
+    """
+    Summarizes a list of per-call durations in seconds.
+
+    >>> timings([0.001, 0.003, 0.002])
+    {'count': 3, 'seconds': 0.006, 'per_op_us': 2000.0, 'p50_us': 2000.0, 'p99_us': 3000.0}
+    """
+    if len(seconds)==0:
+        return {'count': 0, 'seconds': 0.0, 'per_op_us': 0.0, 'p50_us': 0.0, 'p99_us': 0.0}
+
+    ordered= sorted(seconds)
+    total= sum(ordered)
+
+    return {'count': len(ordered),
+            'seconds': round(total, 6),
+            'per_op_us': round(total/len(ordered)*1e6, 1),
+            'p50_us': round(ReplayDriver.percentile(ordered, 50)*1e6, 1),
+            'p99_us': round(ReplayDriver.percentile(ordered, 99)*1e6, 1)}
+
+
+def time_calls(func, args_list):
+    durations= []
+    results= []
+
+    for args in args_list:
+        start= time.perf_counter()
+        results.append(func(*args))
+        durations.append(time.perf_counter()-start)
+
+    return durations, results
+
+
+def run_size(rooms, years, occupancy=0.3, ops=1000, seed=0):
+    """
+    Generates one hotel of the given size in a temporary folder and times
+    loading, reservations, lookups, searches, cancellations and saving it.
+
+    >>> result = run_size(8, 1, occupancy=0.5, ops=5)
+    >>> result['rooms'], result['years'], sorted(result['timings'])
+    (8, 1, ['cancel', 'load', 'lookup', 'reserve', 'save', 'save_all', 'search'])
+    >>> result['timings']['lookup']['count']
+    5
+    """
+    rng= random.Random(seed)
+    first_year= 2001
+    year_list= list(range(first_year, first_year+years))
+    first= datetime.date(first_year, 1, 1).toordinal()
+    last= datetime.date(first_year+years, 1, 1).toordinal()
+    cwd= os.getcwd()
+
+    with tempfile.TemporaryDirectory() as root:
+        os.chdir(root)
+
+        try:
+            hotel= generate_hotel('Benchmark Hotel', rooms, year_list, occupancy, STAY_LENGTHS, rng)
+            hotel.save_hotel()
+            result= {'rooms': rooms, 'years': years, 'occupancy': occupancy, 'reservations': len(hotel.reservations)}
+            del hotel
+
+            start= time.perf_counter()
+            system= Booking.load_system()
+            load= [time.perf_counter()-start]
+            hotel= system.hotels[0]
+
+            requests= []
+
+            for i in range(ops):
+                length= rng.choices(list(STAY_LENGTHS), list(STAY_LENGTHS.values()))[0]
+                night= rng.randrange(first, last-length)
+                check_in= datetime.date.fromordinal(night)
+                requests.append(('Guest', rng.choice(ROOM_TYPES), check_in, check_in+datetime.timedelta(days=length)))
+
+            def reserve(*request):
+                try:
+                    return hotel.make_reservation(*request)
+
+                except AssertionError:
+                    return None
+
+            reserve_times, made= time_calls(reserve, requests)
+            made= [num for num in made if num!=None]
+
+            existing= rng.sample(list(hotel.reservations), min(ops, len(hotel.reservations)))
+            lookup_times= time_calls(system.find_reservation, [(num,) for num in existing])[0]
+
+            search_args= [(check_in, check_out) for name, room_type, check_in, check_out in requests[:max(1, ops//10)]]
+            search_times= time_calls(system.search_availability, search_args)[0]
+
+            cancel_times= time_calls(hotel.cancel_reservation, [(num,) for num in made])[0]
+
+            save_times= time_calls(hotel.save_hotel, [()])[0]
+
+            for room in hotel.rooms:
+                hotel.dirty_months.update(room.availability)
+
+            save_all_times= time_calls(hotel.save_hotel, [()])[0]
+
+        finally:
+            os.chdir(cwd)
+
+    result['timings']= {'load': timings(load),
+                        'reserve': timings(reserve_times),
+                        'lookup': timings(lookup_times),
+                        'search': timings(search_times),
+                        'cancel': timings(cancel_times),
+                        'save': timings(save_times),
+                        'save_all': timings(save_all_times)}
+    result['reserved']= len(made)
+
+    return result
+
+
+def simulate_allocation(rooms=100, demand=1.0, stay_lengths=None, strategies=STRATEGIES, seed=0):
+    """
+    Books one season of requests into an empty one-year hotel once per
+    allocation strategy and reports the share of requests accepted and the
+    latency of each make_reservation call. demand is the number of nights
+    requested as a share of the hotel's room nights; stays of one to three
+    weeks among shorter ones are what fragmentation turns away.
+
+    >>> result = simulate_allocation(rooms=8, demand=0.5)
+    >>> sorted(result)
+    ['best-fit', 'first-fit', 'tight']
+    >>> all(0 < result[strategy]['acceptance'] <= 1 for strategy in result)
+    True
+    >>> result['best-fit']['requests'] == result['first-fit']['requests'], sorted(result['tight']['latency'])
+    (True, ['count', 'p50_us', 'p99_us', 'per_op_us', 'seconds'])
+    """
+    if stay_lengths==None:
+        stay_lengths= SEASON_STAYS
+
+    rng= random.Random(seed)
+    year= 2001
+    first= datetime.date(year, 1, 1).toordinal()
+    last= datetime.date(year+1, 1, 1).toordinal()
+    mean_length= sum(length*weight for length, weight in stay_lengths.items())/sum(stay_lengths.values())
+    requests= []
+
+    for i in range(int(demand*rooms*(last-first)/mean_length)):
+        length= rng.choices(list(stay_lengths), list(stay_lengths.values()))[0]
+        check_in= datetime.date.fromordinal(rng.randrange(first, last-length))
+        requests.append(('Guest', rng.choice(ROOM_TYPES), check_in, check_in+datetime.timedelta(days=length)))
+
+    result= {}
+
+    for strategy in strategies:
+        hotel= generate_hotel('Season Hotel', rooms, [year], 0, rng=random.Random(seed))
+        hotel.allocation= strategy
+
+        def reserve(*request):
+            try:
+                return hotel.make_reservation(*request)
+
+            except AssertionError:
+                return None
+
+        durations, made= time_calls(reserve, requests)
+        accepted= len([num for num in made if num!=None])
+        result[strategy]= {'requests': len(requests),
+                           'accepted': accepted,
+                           'acceptance': round(accepted/max(1, len(requests)), 4),
+                           'latency': timings(durations)}
+
+    return result
+
+
+def traced_bytes(build):
+    gc.collect()
+    tracemalloc.start()
+
+    try:
+        result= build()
+        gc.collect()
+        size= tracemalloc.get_traced_memory()[0]
+
+    finally:
+        tracemalloc.stop()
+
+    return size, result
+
+
+def reservation_memory(rooms=200, years=1, occupancy=0.6, seed=0):
+    """
+    Bytes of traced memory per reservation in a generated hotel: the hotel is
+    built once empty and once with reservations, and the difference is
+    divided by the number of reservations. Room and Reservation use
+    __slots__, ordinal dates and interned strings to keep this down.
+
+    Measured with the defaults (one year, 60% occupancy), before and after
+    slotting Room and Reservation:
+      200 rooms    556 -> 448 bytes per reservation
+      1000 rooms   521 -> 420 bytes per reservation
+
+    >>> per_reservation = reservation_memory(rooms=20)
+    >>> 0 < per_reservation < 800
+    True
+    """
+    year_list= list(range(2001, 2001+years))
+    empty= traced_bytes(lambda: generate_hotel('Empty Hotel', rooms, year_list, 0, rng=random.Random(seed)))[0]
+    full, hotel= traced_bytes(lambda: generate_hotel('Full Hotel', rooms, year_list, occupancy, rng=random.Random(seed)))
+
+    return (full-empty)/len(hotel.reservations)
+
+
+def import_time(module='booking'):
+    """
+    Imports module in a fresh interpreter under -X importtime and returns the
+    cumulative import time in seconds and the names of the modules imported.
+    Starting the CLI should stay under IMPORT_BUDGET and must not pull in
+    NumPy or matplotlib.
+
+    >>> seconds, modules = import_time('booking')
+    >>> seconds < IMPORT_BUDGET, 'numpy' in modules, 'matplotlib' in modules, 'doctest' in modules
+    (True, False, False, False)
+    """
+    folder= os.path.dirname(os.path.abspath(__file__))
+    done= subprocess.run([sys.executable, '-X', 'importtime', '-c', 'import '+module], cwd=folder, capture_output=True, text=True, check=True)
+    modules= set()
+    seconds= 0.0
+
+    for line in done.stderr.splitlines():
+
+        if not line.startswith('import time:') or line.endswith('| package'):
+            continue
+
+        own, cumulative, name= line[len('import time:'):].split('|')
+        modules.add(name.strip())
+
+        if name.strip()==module:
+            seconds= int(cumulative)/1e6
+
+    return seconds, modules
+
+
+def run(sizes=SIZES, occupancy=0.3, ops=1000, seed=0):
+    return {'version': 1,
+            'python': platform.python_version(),
+            'created': datetime.datetime.now(datetime.timezone.utc).isoformat(timespec='seconds'),
+            'ops': ops,
+            'seed': seed,
+            'import_seconds': import_time('booking')[0],
+            'bytes_per_reservation': round(reservation_memory(), 1),
+            'allocation': simulate_allocation(seed=seed),
+            'results': [run_size(rooms, years, occupancy, ops, seed) for rooms, years in sizes]}
+
+
+def main(argv=None):
+    parser= argparse.ArgumentParser(description="Time load, reserve, lookup, search, cancel and save on generated hotels.")
+    parser.add_argument('--sizes', type=parse_sizes, default=SIZES, help="ROOMSxYEARS list, e.g. 100x1,500x3")
+    parser.add_argument('--occupancy', type=float, default=0.3)
+    parser.add_argument('--ops', type=int, default=1000, help="operations of each kind per size")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('-o', '--output', default='-', help="JSON output file (default: stdout)")
+    args= parser.parse_args(argv)
+
+    report= json.dumps(run(args.sizes, args.occupancy, args.ops, args.seed), indent=2)
+
+    if args.output=='-':
+        print(report)
+
+    else:
+        with open(args.output, 'w', encoding = 'utf-8') as fobj:
+            fobj.write(report+'\n')
+
+
+if __name__=='__main__':
+    main()
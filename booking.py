@@ -2,18 +2,31 @@
 import datetime
 import random
 from hotel import Hotel
-import matplotlib
 import os
-import doctest
 from reservation import Reservation
+from registry import BookingRegistry
+from snapshot import HotelSnapshot
+from metrics import METRICS
+from loader import HotelLoader
 
 class Booking:
     
-    def __init__(self, hotels):
+    def __init__(self, hotels, registry=None, loader=None):
         self.hotels= hotels
+        self.loader= loader
+        
+        if registry==None:
+            registry= BookingRegistry()
+        
+        self.registry= registry
+        
+        for hotel_obj in self.hotels:
+            
+            if hotel_obj.registry is not self.registry:
+                hotel_obj.use_registry(self.registry)
         
     @classmethod
-    def load_system(cls):
+    def load_system(cls, workers=None, lazy=False, max_months=12, journal=False, fsync_every=1, snapshots=False, metrics=False, storage=None):
         """
         >>> system = Booking.load_system()
         >>> len(system.hotels)
@@ -22,16 +35,218 @@ class Booking:
         'The Great Northern Hotel'
         >>> print(system.hotels[1].rooms[314])
         Room 315,Queen,129.99
+        
+        >>> parallel = Booking.load_system(workers=2)
+        >>> [hotel.name for hotel in parallel.hotels] == [hotel.name for hotel in system.hotels]
+        True
+        >>> for hotel, other in zip(parallel.hotels, system.hotels):
+        ...     print(list(map(str, hotel.reservations.values())) == list(map(str, other.reservations.values())))
+        True
+        True
+        """
+        if metrics:
+            METRICS.enable()
+        
+        hotels=[]
+        registry= BookingRegistry()
+        
+        if storage!=None:
+            list_hotels= storage.folders()
+        
+        else:
+            list_hotels= os.listdir('hotels')
+        
+        if storage!=None:
+            
+            for file in list_hotels:
+                hotels.append(Hotel.load_hotel(file, registry, lazy, max_months, storage))
+        
+        elif lazy:
+            
+            for file in list_hotels:
+                hotels.append(Hotel.load_hotel(file, registry, lazy=True, max_months=max_months))
+        
+        elif workers!=None and workers>1:
+            hotels= cls.load_hotels_in_parallel(list_hotels, registry, workers)
+        
+        else:
+            
+            for file in list_hotels:
+                
+                if snapshots and Hotel.snapshot_is_fresh(file):
+                    hotels.append(Hotel.load_snapshot(file, registry))
+                    continue
+                
+                hotel= Hotel.load_hotel(file, registry)
+                hotels.append(hotel)
+                
+                if snapshots:
+                    hotel.save_snapshot()
+        
+        for hotel in hotels:
+            hotel.replay_journal()
+            
+            if journal:
+                hotel.enable_journal(fsync_every)
+        
+        return cls(hotels, registry)
+    
+    @classmethod
+    def start(cls, lazy=False, max_months=12, journal=False, fsync_every=1):
+        """
+        Returns straight away, with the hotels loading in a background thread.
+        Hotel names are known at once; wait_for_hotel() blocks until one hotel
+        is loaded and wait_for_hotels() until all of them are.
+        
+        >>> system = Booking.start()
+        >>> system.hotel_names()
+        ['Overlook Hotel', 'The Great Northern Hotel']
+        >>> print(system.wait_for_hotel(1).rooms[314])
+        Room 315,Queen,129.99
+        >>> len(system.wait_for_hotels()), system.loader
+        (2, None)
+        """
+        registry= BookingRegistry()
+        registry.enable_locking()
+        loader= HotelLoader(os.listdir('hotels'), registry, lazy, max_months, journal, fsync_every)
+        loader.start()
+        
+        return cls([], registry, loader)
+    
+    def hotel_names(self):
+        if self.loader!=None:
+            return list(self.loader.names)
+        
+        return [hotel_obj.name for hotel_obj in self.hotels]
+    
+    def wait_for_hotel(self, index):
+        if self.loader!=None:
+            return self.loader.hotel(index)
+        
+        return self.hotels[index]
+    
+    def wait_for_hotels(self):
+        if self.loader!=None:
+            self.hotels= self.loader.all()
+            self.loader= None
+        
+        return self.hotels
+    
+    def loaded_hotels(self):
+        if self.loader!=None:
+            return self.loader.loaded()
+        
+        return self.hotels
+    
+    @staticmethod
+    def lookup_in_snapshots(booking_num):
         """
+        >>> system = Booking.load_system(snapshots=True)
+        >>> Booking.lookup_in_snapshots(9998701091820)
+        ('Overlook Hotel', 9998701091820, 236, datetime.date(1975, 10, 30), datetime.date(1975, 12, 24), 'Jack')
+        >>> for file in os.listdir('hotels'):
+        ...     os.remove('hotels/'+file+'/snapshot.bin')
+        """
+        for file in os.listdir('hotels'):
+            
+            if not Hotel.snapshot_is_fresh(file):
+                continue
+            
+            with HotelSnapshot('hotels/'+file+'/snapshot.bin') as snap:
+                found= snap.find(booking_num)
+                
+                if found!=None:
+                    return (snap.name,)+found
+        
+        return None
+    
+    @staticmethod
+    def load_hotels_in_parallel(list_hotels, registry, workers):
+        import concurrent.futures
+        
         hotels=[]
-        list_hotels= os.listdir('hotels')
+        months={}
+        futures={}
+        
+        with concurrent.futures.ProcessPoolExecutor(max_workers=workers) as pool:
+            
+            for file in list_hotels:
+                months[file]= Hotel.list_month_files(file)
+                futures[file]=[]
+                
+                for year, month in months[file]:
+                    futures[file].append(pool.submit(Hotel.read_reservation_cells, file, month, year))
+            
+            for file in list_hotels:
+                month_cells= [future.result() for future in futures[file]]
+                hotels.append(Hotel.build_hotel(file, months[file], month_cells, registry))
+        
+        return hotels
+        
+    def search_availability(self, check_in, check_out, room_types=None):
+        """
+        >>> system = Booking.load_system()
+        >>> found = system.search_availability(datetime.date(1975, 12, 20), datetime.date(1975, 12, 27))
+        >>> found['The Great Northern Hotel']['Queen']
+        (0, None)
+        >>> found['Overlook Hotel']['Twin']
+        (0, None)
+        >>> found = system.search_availability(datetime.date(1975, 12, 20), datetime.date(1975, 12, 27), ['King'])
+        >>> found['Overlook Hotel']
+        {'King': (173, 50.35)}
+        """
+        results= {}
+        
+        for hotel_obj in self.wait_for_hotels():
+            results[hotel_obj.name]= hotel_obj.search_availability(check_in, check_out, room_types)
+        
+        return results
+    
+    def metrics_snapshot(self):
+        """
+        >>> system = Booking.load_system(metrics=True)
+        >>> stats = system.metrics_snapshot()
+        >>> stats['calls']['Hotel.load_hotel']['count'], len(stats['bytes_read'])
+        (2, 24)
+        >>> 'hotel_calls_total{method="Hotel.load_hotel"} 2' in system.metrics_text()
+        True
+        >>> METRICS.disable()
+        >>> METRICS.reset()
+        """
+        return METRICS.snapshot()
+    
+    def metrics_text(self):
+        return METRICS.prometheus()
+    
+    def find_reservation(self, booking_num):
+        """
+        >>> system = Booking.load_system(lazy=True, max_months=2)
+        >>> hotel_obj, reservation = system.find_reservation(3020747285952)
+        >>> hotel_obj.name, reservation.name
+        ('The Great Northern Hotel', 'Judy')
+        >>> system.registry.owner(3020747285952) is hotel_obj
+        True
+        >>> system.find_reservation(123)
+        (None, None)
+        """
+        self.wait_for_hotels()
+        hotel_obj= self.registry.owner(booking_num)
         
-        for file in list_hotels:
-            hotel= Hotel.load_hotel(file)
-            hotels.append(hotel)
+        if hotel_obj!=None:
+            return hotel_obj, hotel_obj.find_reservation(booking_num)
         
-        return cls(hotels)
+        for hotel_obj in self.hotels:
+            
+            if hotel_obj.month_cache==None:
+                continue
+            
+            reservation= hotel_obj.find_reservation(booking_num)
+            
+            if reservation!=None:
+                return hotel_obj, reservation
         
+        return None, None
+    
     def menu(self):
         """
         >>> booking = Booking.load_system()
@@ -64,19 +279,20 @@ class Booking:
         elif choice=="xyzzy":
             self.delete_reservations_at_random()
         
-        for hotel_obj in self.hotels:
-            hotel_obj.save_hotel()
+        for hotel_obj in self.loaded_hotels():
+            hotel_obj.persist()
         
     def create_reservation(self):
         user_name= input("Please enter your name: ")
         print("Hi "+ user_name +"! Which hotel would you like to book?")
         
-        for i, hotel_obj in enumerate(self.hotels):
-            print(i+1, str(hotel_obj.name))
+        for i, hotel_name in enumerate(self.hotel_names()):
+            print(i+1, str(hotel_name))
         
         hotel_num= int(input())
+        hotel_obj= self.wait_for_hotel(hotel_num-1)
         print("which type o froom would you like?")
-        room_types= self.hotels[hotel_num-1].get_available_room_types()
+        room_types= hotel_obj.get_available_room_types()
         
         for i, room_type in enumerate(room_types):
             print(i+1, room_type)
@@ -95,29 +311,23 @@ class Booking:
         
         print("Ok. Making your reservation for a "+ room_types[room_type_num-1] +" room.")
         
-        booking_num= self.hotels[hotel_num-1].make_reservation(user_name, room_types[room_type_num-1], date1, date2)
+        booking_num= hotel_obj.make_reservation(user_name, room_types[room_type_num-1], date1, date2)
         print("Your reservation number is: ", booking_num )
         
-        receipt= str(round(self.hotels[hotel_num-1].get_receipt([booking_num]), 2))
+        receipt= str(round(hotel_obj.get_receipt([booking_num]), 2))
         print("Your total amount due is: $"+ receipt)
         print("Thank you!")
         
     def cancel_reservation(self):
         user_num= int(input("Please enter your booking number: "))
+        hotel_obj, reservation= self.find_reservation(user_num)
         
-        for hotel_obj in self.hotels:
-            booking_nums=[]
-            
-            for reservation in hotel_obj.reservations:
-                booking_nums.append(reservation)
-            
+        if reservation==None:
+            print("Could not find a reservation with that booking number.")
+        
+        else:
             hotel_obj.cancel_reservation(user_num)
-            
-            if len(booking_nums)== len(hotel_obj.reservations):
-                print("Could not find a reservation with that booking number.")
-            
-            else:
-                print("Cancelled successfully.")
+            print("Cancelled successfully.")
     
     def lookup_reservation(self):
         user_answer= input("Do you have your booking number(s)? ")
@@ -135,17 +345,16 @@ class Booking:
                 if user_num!='end':
                     booking_nums.append(int(user_num))
             
-            for hotel_obj in self.hotels:
+            for booking_num in booking_nums:
+                hotel_obj, reservation= self.find_reservation(booking_num)
                 
-                for booking_num in booking_nums:
+                if reservation!=None:
                     print('Reservation found at '+str(hotel_obj.name)+':')
-                    
-                    try:
-                        print(hotel_obj.reservations[booking_num])
-                        print("Total amount due: $"+str(round(hotel_obj.get_receipt([booking_num]), 2)))
-                    
-                    except:
-                        print("No reservation was found with the number: " +str(booking_num))
+                    print(reservation)
+                    print("Total amount due: $"+str(round(hotel_obj.get_receipt([booking_num]), 2)))
+                
+                else:
+                    print("No reservation was found with the number: " +str(booking_num))
         
         else:
             user_name= input("Please enter your name: ")
@@ -154,26 +363,29 @@ class Booking:
             check_in= input("Enter the check-in date (YYYY-MM-DD): ")
             check_out= input("Enter the check-out date (YYYY-MM-DD): ")
             
-            for hotel_obj in self.hotels:
+            for i, hotel_name in enumerate(self.hotel_names()):
                 
-                if hotel_obj.name== chosen_hotel:
-                    message=[]
+                if hotel_name== chosen_hotel:
+                    hotel_obj= self.wait_for_hotel(i)
+                    
+                    try:
+                        reservation= hotel_obj.find_by_stay(int(room_num), datetime.date.fromisoformat(check_in))
+                    
+                    except ValueError:
+                        reservation= None
+                    
+                    condition1= reservation!=None and Hotel.normalize_name(reservation.name)== Hotel.normalize_name(user_name)
+                    condition2= reservation!=None and str(reservation.check_out)== check_out
                     
-                    for booking_num, reservation in hotel_obj.reservations.items():
-                        condition1= reservation.room_reserved.room_num== int(room_num)
-                        condition2= reservation.name.lower()== user_name.lower()
-                        condition3= str(reservation.check_in)== check_in
-                        condition4= str(reservation.check_out)== check_out
-                        
-                        if condition1 and condition2 and condition3 and condition4:
-                            print("Reservation found under booking number "+str(booking_num)+'.')
-                            print("Here are the details: ")
-                            print(reservation)
-                            print("Total amount due: $"+str(round(hotel_obj.get_receipt([booking_num]), 2)))
-                            message.append("a room was found.")
-                        
-                        if len(message)==0:
-                            print("No room was found under this information.")
+                    if condition1 and condition2:
+                        booking_num= reservation.booking_number
+                        print("Reservation found under booking number "+str(booking_num)+'.')
+                        print("Here are the details: ")
+                        print(reservation)
+                        print("Total amount due: $"+str(round(hotel_obj.get_receipt([booking_num]), 2)))
+                    
+                    else:
+                        print("No room was found under this information.")
         
     def delete_reservations_at_random(self):
         """
@@ -187,11 +399,10 @@ class Booking:
         1
         """
         print("You said the magic word!")
+        self.wait_for_hotels()
         hotel_to_delete= random.randint(0, len(self.hotels)-1)
-        booking_nums=[]
-        
-        for reservation in self.hotels[hotel_to_delete].reservations:
-            booking_nums.append(reservation)
-        
-        for reservation in booking_nums:
-            self.hotels[hotel_to_delete].cancel_reservation(reservation)
+        self.hotels[hotel_to_delete].purge(lambda reservation: True)
+
+
+if __name__=='__main__':
+    Booking.start().menu()
@@ -0,0 +1,184 @@
+import bisect
+import datetime
+import threading
+
+MONTHS = ['Jan', 'Feb', 'Mar', 'Apr', 'May', 'Jun', 'Jul', 'Aug', 'Sep', 'Oct', 'Nov', 'Dec']
+DAYS_PER_MONTH = [31, 28, 31, 30, 31, 30, 31, 31, 30, 31, 30, 31]
+
+
+def is_leap_year(year):
+    """
+    >>> [is_leap_year(year) for year in (1600, 1900, 2020, 2021)]
+    [True, False, True, False]
+    """
+    return year%4==0 and (year%100!=0 or year%400==0)
+
+
+class CalendarTable:
+    """
+    Month lengths and the ordinal of the first day of every month between
+    first_year and last_year, so converting between (year, month, day) and
+    date ordinals is table arithmetic instead of datetime.date and timedelta
+    objects. A date outside the horizon extends it by whole years, under a
+    lock so that concurrent bookings can extend it safely. The first year,
+    last year and month starts are published together as one table tuple,
+    and every lookup reads a single table, so a lookup racing an extension
+    never pairs the new first year with the old starts.
+
+    >>> table = CalendarTable(2020, 2021)
+    >>> table.to_ordinal(2021, 3, 1) == datetime.date(2021, 3, 1).toordinal()
+    True
+    >>> table.month_length(2020, 2), table.month_length(2021, 2)
+    (29, 28)
+    >>> table.from_ordinal(datetime.date(2020, 12, 31).toordinal())
+    (2020, 12, 31)
+    >>> table.months_between(table.to_ordinal(2021, 12, 20), table.to_ordinal(2022, 1, 8))
+    [(2021, 12), (2022, 1)]
+    >>> table.last_year
+    2022
+    >>> table.month_start(1999, 1) == datetime.date(1999, 1, 1).toordinal(), table.first_year
+    (True, 1999)
+
+    >>> import threading
+    >>> table = CalendarTable(2020, 2020)
+    >>> def look_up(year):
+    ...     results.append(table.from_ordinal(datetime.date(year, 6, 15).toordinal()) == (year, 6, 15))
+    >>> results = []
+    >>> threads = [threading.Thread(target=look_up, args=(year,)) for year in range(1900, 2020, 3)]
+    >>> for thread in threads:
+    ...     thread.start()
+    >>> for thread in threads:
+    ...     thread.join()
+    >>> len(results), all(results)
+    (40, True)
+    """
+    def __init__(self, first_year=1970, last_year=2050):
+        self.table= (first_year, first_year-1, [datetime.date(first_year, 1, 1).toordinal()])
+        self.lock= threading.Lock()
+        self.extend_to(last_year)
+
+    @property
+    def first_year(self):
+        return self.table[0]
+
+    @property
+    def last_year(self):
+        return self.table[1]
+
+    @property
+    def starts(self):
+        return self.table[2]
+
+    def extend_to(self, year):
+        with self.lock:
+            first_year, last_year, starts= self.table
+
+            if first_year<=year<=last_year:
+                return
+
+            starts= list(starts)
+
+            if year<first_year:
+                earlier= [datetime.date(year, 1, 1).toordinal()]
+
+                for month_index in range((first_year-year)*12):
+                    earlier.append(earlier[-1]+self.days_in(year+month_index//12, month_index%12+1))
+
+                starts[:0]= earlier[:-1]
+                first_year= year
+
+            while last_year<year:
+
+                for month in range(1, 13):
+                    starts.append(starts[-1]+self.days_in(last_year+1, month))
+
+                last_year+= 1
+
+            self.table= (first_year, last_year, starts)
+
+    @staticmethod
+    def days_in(year, month):
+        if month==2 and is_leap_year(year):
+            return 29
+
+        return DAYS_PER_MONTH[month-1]
+
+    def locate(self, year, month):
+        table= self.table
+
+        if year<table[0] or year>table[1]:
+            self.extend_to(year)
+            table= self.table
+
+        return table[2], (year-table[0])*12+month-1
+
+    def month_index(self, year, month):
+        return self.locate(year, month)[1]
+
+    def month_start(self, year, month):
+        starts, index= self.locate(year, month)
+
+        return starts[index]
+
+    def month_length(self, year, month):
+        starts, index= self.locate(year, month)
+
+        return starts[index+1]-starts[index]
+
+    def month_range(self, year, month):
+        starts, index= self.locate(year, month)
+        first= starts[index]
+
+        return first, starts[index+1]-first
+
+    def to_ordinal(self, year, month, day):
+        starts, index= self.locate(year, month)
+
+        return starts[index]+day-1
+
+    def locate_ordinal(self, ordinal):
+        table= self.table
+
+        while ordinal<table[2][0]:
+            self.extend_to(table[0]-1)
+            table= self.table
+
+        while ordinal>=table[2][-1]:
+            self.extend_to(table[1]+1)
+            table= self.table
+
+        return table[0], table[2], bisect.bisect_right(table[2], ordinal)-1
+
+    def month_index_of(self, ordinal):
+        return self.locate_ordinal(ordinal)[2]
+
+    def month_of(self, ordinal):
+        first_year, starts, index= self.locate_ordinal(ordinal)
+
+        return first_year+index//12, index%12+1
+
+    def from_ordinal(self, ordinal):
+        first_year, starts, index= self.locate_ordinal(ordinal)
+
+        return first_year+index//12, index%12+1, ordinal-starts[index]+1
+
+    def months_between(self, start, end):
+        """
+        The (year, month) of every night in [start, end).
+
+        >>> CALENDAR.months_between(CALENDAR.to_ordinal(2021, 5, 3), CALENDAR.to_ordinal(2021, 6, 1))
+        [(2021, 5)]
+        >>> CALENDAR.months_between(CALENDAR.to_ordinal(2021, 5, 3), CALENDAR.to_ordinal(2021, 5, 3))
+        []
+        """
+        if start>=end:
+            return []
+
+        last= self.locate_ordinal(end-1)
+        first_year, starts, first= self.locate_ordinal(start)
+        last= last[2]+(last[0]-first_year)*12
+
+        return [(first_year+index//12, index%12+1) for index in range(first, last+1)]
+
+
+CALENDAR= CalendarTable()
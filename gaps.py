@@ -0,0 +1,383 @@
+import bisect
+import contextlib
+import datetime
+import functools
+from availability import IntervalSet
+from room import Room
+
+STRATEGIES= ('first-fit', 'best-fit', 'tight')
+EMPTY= float('-inf')
+
+
+class MaxTree:
+    """
+    Segment tree of the maximum value at positions 0..size-1, with searches
+    for the leftmost or rightmost position in a range whose value reaches a
+    threshold. Subtrees whose maximum is below the threshold are skipped, so
+    a search costs O(log size).
+
+    >>> tree = MaxTree(10)
+    >>> tree.set(2, 7)
+    >>> tree.set(6, 4)
+    >>> tree.rightmost(0, 9, 5), tree.rightmost(0, 9, 3), tree.leftmost(3, 9, 3), tree.leftmost(0, 9, 8)
+    (2, 6, 6, None)
+    >>> tree.set(2, EMPTY)
+    >>> tree.rightmost(0, 5, 1)
+    """
+    def __init__(self, size):
+        self.size= 1
+
+        while self.size<size:
+            self.size*= 2
+
+        self.values= [EMPTY]*(2*self.size)
+
+    def set(self, position, value):
+        node= position+self.size
+        self.values[node]= value
+        node//= 2
+
+        while node>=1:
+            value= max(self.values[2*node], self.values[2*node+1])
+
+            if self.values[node]==value:
+                return
+
+            self.values[node]= value
+            node//= 2
+
+    def rightmost(self, lo, hi, threshold):
+        return self.search(1, 0, self.size-1, max(lo, 0), min(hi, self.size-1), threshold, True)
+
+    def leftmost(self, lo, hi, threshold):
+        return self.search(1, 0, self.size-1, max(lo, 0), min(hi, self.size-1), threshold, False)
+
+    def search(self, node, node_lo, node_hi, lo, hi, threshold, right):
+        if node_hi<lo or node_lo>hi or self.values[node]<threshold:
+            return None
+
+        if node_lo==node_hi:
+            return node_lo
+
+        mid= (node_lo+node_hi)//2
+        halves= [(2*node, node_lo, mid), (2*node+1, mid+1, node_hi)]
+
+        if right:
+            halves.reverse()
+
+        for child, child_lo, child_hi in halves:
+            found= self.search(child, child_lo, child_hi, lo, hi, threshold, right)
+
+            if found!=None:
+                return found
+
+        return None
+
+
+class GapIndex:
+    """
+    Free gaps of every room, indexed per room type so that a room for a stay
+    [start, end) is chosen in logarithmic time instead of by scanning the
+    rooms. Room availability listeners keep it up to date.
+
+    Gaps are kept in segment trees over the nights of the calendar:
+      'start'  by first night, holding the latest end of the gaps starting there
+      'end'    by end night, holding the earliest start of the gaps ending there
+      0, 1, .. one 'start' tree per length class, gaps of 2**c to 2**(c+1)-1 nights
+
+    Strategies:
+      best-fit  the shortest gap that holds the stay: the smallest length
+                class with a fitting gap is found first, and only that class
+                is scanned, from the latest start back, until no earlier
+                start can give a shorter gap
+      tight     the gap that leaves the smallest remainder on one side of the
+                stay, found as the latest-starting and the earliest-ending
+                gaps that hold it, so stays pack against existing bookings
+    First-fit needs no index; Hotel.find_available_room scans the rooms.
+
+    A tight choice is O(log nights). A best-fit choice is O(classes * log
+    nights) to find the class, plus O(log nights) for each first night the
+    scan of that class visits; the scan stops once check_out minus the
+    first night is longer than the best gap found, so it visits at most
+    that many nights. An update is O(log nights), plus the insertion into
+    the list of gaps sharing the same first or end night, which is at most
+    the number of rooms of the type.
+
+    >>> rooms = [Room("Queen", 100+i, 80.0) for i in range(3)]
+    >>> for r in rooms:
+    ...     r.set_up_room_availability(['May'], 2021)
+    >>> may = lambda day: datetime.date(2021, 5, day)
+    >>> rooms[0].reserve_range(may(1), may(20))
+    >>> rooms[1].reserve_range(may(1), may(10))
+    >>> rooms[1].reserve_range(may(15), datetime.date(2021, 6, 1))
+    >>> rooms[2].reserve_range(may(1), may(12))
+    >>> index = GapIndex(rooms)
+    >>> [index.choose('Queen', may(12), may(14), strategy).room_num for strategy in ('best-fit', 'tight')]
+    [101, 102]
+    >>> rooms[1].reserve_range(may(10), may(15))
+    >>> [index.choose('Queen', may(12), may(14), strategy).room_num for strategy in ('best-fit', 'tight')]
+    [102, 102]
+    >>> print(index.choose('Queen', may(1), may(3), 'best-fit'))
+    None
+    >>> rooms[0].release_range(may(1), may(20))
+    >>> index.choose('Queen', may(1), may(3), 'best-fit').room_num
+    100
+    >>> rooms[2].set_up_room_availability(['Jun'], 2021)
+    >>> index.choose('Queen', datetime.date(2021, 6, 10), datetime.date(2021, 6, 12), 'tight').room_num
+    102
+
+    Both gaps below are in the 8-15 night class; best-fit takes the shorter
+    one even though it starts earlier.
+
+    >>> more = [Room("King", 200+i, 90.0) for i in range(2)]
+    >>> for r in more:
+    ...     r.set_up_room_availability(['May'], 2021)
+    >>> more[0].reserve_range(may(14), datetime.date(2021, 6, 1))
+    >>> more[1].reserve_range(may(1), may(6))
+    >>> more[1].reserve_range(may(21), datetime.date(2021, 6, 1))
+    >>> GapIndex(more).choose('King', may(8), may(10), 'best-fit').room_num
+    200
+
+    >>> index.choose('Queen', may(1), may(3), 'worst-fit')
+    Traceback (most recent call last):
+    AssertionError: Unknown allocation strategy: worst-fit
+    """
+    def __init__(self, rooms):
+        self.rooms= {}
+        self.free= {}
+        self.leaves= {}
+        self.trees= {}
+        self.base= None
+        self.size= 0
+        self.lock= contextlib.nullcontext()
+        self.listeners= []
+        positions= {}
+
+        for room in rooms:
+            position= positions.get(room.room_type, 0)
+            positions[room.room_type]= position+1
+            self.rooms[(room.room_type, position)]= room
+            self.leaves.setdefault(room.room_type, {'start': {}, 'end': {}})
+            self.trees.setdefault(room.room_type, {})
+            free= IntervalSet()
+            self.free[room.room_num]= free
+
+            for start, end in room.availability.free_ranges():
+                free.add(start, end)
+                self.insert(room.room_type, start, end, position)
+
+            listener= functools.partial(self.update, room, position)
+            room.availability.listeners.append(listener)
+            self.listeners.append((room, listener))
+
+    def detach(self):
+        for room, listener in self.listeners:
+            room.availability.listeners.remove(listener)
+
+        self.listeners= []
+
+    def cover(self, first, last):
+        if self.base==None:
+            self.base= first
+            self.size= last-first+1
+            self.rebuild()
+            return
+
+        if first>=self.base and last<self.base+self.size:
+            return
+
+        end= self.base+self.size
+
+        if last>=end:
+            end= max(last+1, self.base+2*self.size)
+
+        if first<self.base:
+            self.base= min(first, self.base-self.size)
+
+        self.size= end-self.base
+        self.rebuild()
+
+    def rebuild(self):
+        for room_type, kinds in self.leaves.items():
+            trees= {}
+
+            for kind, leaves in kinds.items():
+                tree= MaxTree(self.size)
+
+                for night, entries in leaves.items():
+                    tree.set(night-self.base, GapIndex.leaf_value(kind, entries))
+
+                trees[kind]= tree
+
+            self.trees[room_type]= trees
+
+        self.size= MaxTree(self.size).size
+
+    @staticmethod
+    def leaf_value(kind, entries):
+        if len(entries)==0:
+            return EMPTY
+
+        if kind=='end':
+            return -entries[0][0]
+
+        return entries[-1][0]
+
+    @staticmethod
+    def length_class(length):
+        return max(length, 1).bit_length()-1
+
+    def put(self, room_type, kind, night, entry, add):
+        leaves= self.leaves[room_type].setdefault(kind, {})
+        entries= leaves.setdefault(night, [])
+
+        if add:
+            bisect.insort(entries, entry)
+
+        else:
+            del entries[bisect.bisect_left(entries, entry)]
+
+        if len(entries)==0:
+            del leaves[night]
+
+        trees= self.trees[room_type]
+
+        if kind not in trees:
+            trees[kind]= MaxTree(self.size)
+
+        trees[kind].set(night-self.base, GapIndex.leaf_value(kind, entries))
+
+    def insert(self, room_type, start, end, position):
+        self.cover(start, end)
+        self.put(room_type, 'start', start, (end, position), True)
+        self.put(room_type, 'end', end, (start, position), True)
+        self.put(room_type, GapIndex.length_class(end-start), start, (end, position), True)
+
+    def delete(self, room_type, start, end, position):
+        self.put(room_type, 'start', start, (end, position), False)
+        self.put(room_type, 'end', end, (start, position), False)
+        self.put(room_type, GapIndex.length_class(end-start), start, (end, position), False)
+
+    @staticmethod
+    def touching(free, start, end):
+        lo= bisect.bisect_left(free.ends, start)
+        hi= bisect.bisect_right(free.starts, end)
+
+        return list(zip(free.starts[lo:hi], free.ends[lo:hi]))
+
+    def update(self, room, position, start, end, delta):
+        free= self.free[room.room_num]
+
+        with self.lock:
+
+            for gap_start, gap_end in GapIndex.touching(free, start, end):
+                self.delete(room.room_type, gap_start, gap_end, position)
+
+            if delta>0:
+                free.add(start, end)
+
+            else:
+                free.remove(start, end)
+
+            for gap_start, gap_end in GapIndex.touching(free, start, end):
+                self.insert(room.room_type, gap_start, gap_end, position)
+
+    def latest_start(self, room_type, kind, start, end):
+        tree= self.trees[room_type].get(kind)
+
+        if tree==None:
+            return None
+
+        night= tree.rightmost(0, start-self.base, end)
+
+        if night==None:
+            return None
+
+        night+= self.base
+        entries= self.leaves[room_type][kind][night]
+        gap_end, position= entries[bisect.bisect_left(entries, (end,))]
+
+        return night, gap_end, position
+
+    def earliest_end(self, room_type, start, end):
+        night= self.trees[room_type]['end'].leftmost(end-self.base, self.size-1, -start)
+
+        if night==None:
+            return None
+
+        night+= self.base
+        entries= self.leaves[room_type]['end'][night]
+        gap_start, position= entries[bisect.bisect_right(entries, (start, float('inf')))-1]
+
+        return gap_start, night, position
+
+    def best_fit(self, room_type, start, end):
+        classes= sorted(kind for kind in self.trees[room_type] if kind not in ('start', 'end'))
+
+        for length_class in classes[bisect.bisect_left(classes, GapIndex.length_class(end-start)):]:
+            found= self.shortest_in_class(room_type, length_class, start, end)
+
+            if found!=None:
+                return found[1]
+
+        return None
+
+    def shortest_in_class(self, room_type, length_class, start, end):
+        tree= self.trees[room_type][length_class]
+        leaves= self.leaves[room_type][length_class]
+        best= None
+        night= tree.rightmost(0, start-self.base, end)
+
+        while night!=None:
+            gap_start= night+self.base
+
+            if best!=None and end-gap_start>best[0]:
+                break
+
+            entries= leaves[gap_start]
+            gap_end, position= entries[bisect.bisect_left(entries, (end,))]
+
+            if best==None or (gap_end-gap_start, position)<best:
+                best= (gap_end-gap_start, position)
+
+            night= tree.rightmost(0, night-1, end)
+
+        return best
+
+    def tight(self, room_type, start, end):
+        found= []
+        latest= self.latest_start(room_type, 'start', start, end)
+        earliest= self.earliest_end(room_type, start, end)
+
+        if latest!=None:
+            found.append((start-latest[0], latest[1]-latest[0], latest[2]))
+
+        if earliest!=None:
+            found.append((earliest[1]-end, earliest[1]-earliest[0], earliest[2]))
+
+        if len(found)==0:
+            return None
+
+        return min(found)[2]
+
+    def choose(self, room_type, check_in, check_out, strategy='best-fit'):
+        if strategy not in ('best-fit', 'tight'):
+            raise AssertionError("Unknown allocation strategy: "+str(strategy))
+
+        start, end= check_in.toordinal(), check_out.toordinal()
+
+        with self.lock:
+
+            if room_type not in self.trees or self.base==None:
+                return None
+
+            if strategy=='best-fit':
+                position= self.best_fit(room_type, start, end)
+
+            else:
+                position= self.tight(room_type, start, end)
+
+        if position==None:
+            return None
+
+        return self.rooms[(room_type, position)]
@@ -0,0 +1,140 @@
+import argparse
+import datetime
+import os
+import random
+from hotel import Hotel
+from room import Room, MONTHS
+from reservation import Reservation
+from registry import BookingRegistry
+
+ROOM_TYPES= ['Double', 'Queen', 'King', 'Twin']
+GUESTS= ['Jack', 'Wendy', 'Danny', 'Dick', 'Judy', 'Dale', 'Laura', 'Audrey', 'Harry', 'Lucy']
+STAY_LENGTHS= {1: 3, 2: 4, 3: 3, 4: 2, 5: 1, 7: 1, 14: 1}
+
+
+def parse_stay_lengths(text):
+    """
+    >>> parse_stay_lengths('1:3,2:4,7:1')
+    {1: 3.0, 2: 4.0, 7: 1.0}
+    """
+    lengths= {}
+
+    for part in text.split(','):
+        length, weight= part.split(':')
+        lengths[int(length)]= float(weight)
+
+    return lengths
+
+
+def generate_hotel(name, rooms=500, years=(1975,), occupancy=0.3, stay_lengths=None, rng=None, registry=None):
+    """
+    Builds a hotel with the given number of rooms, every month of the given
+    years set up, and reservations filling roughly occupancy of the nights.
+    Stay lengths are drawn from stay_lengths, a {nights: weight} dict. The
+    hotel is returned unsaved; save_hotel() writes it under hotels/.
+
+    >>> hotel = generate_hotel('Black Lodge', rooms=20, years=[2021, 2022], occupancy=0.5, rng=random.Random(5))
+    >>> len(hotel.rooms), len(hotel.rooms[0].availability), hotel.rooms[0].room_type
+    (20, 24, 'Double')
+    >>> booked = sum((rsv.check_out-rsv.check_in).days for rsv in hotel.reservations.values())
+    >>> 0.4 < booked/(20*730) < 0.6
+    True
+    >>> generate_hotel('Empty', rooms=3, occupancy=0).reservations
+    {}
+
+    Booking numbers are drawn from rng too, so a seed reproduces the hotel.
+
+    >>> first = generate_hotel('Black Lodge', rooms=5, rng=random.Random(7))
+    >>> again = generate_hotel('Black Lodge', rooms=5, rng=random.Random(7))
+    >>> list(first.reservations) == list(again.reservations)
+    True
+    """
+    if rng==None:
+        rng= random.Random()
+
+    if stay_lengths==None:
+        stay_lengths= STAY_LENGTHS
+
+    if registry==None:
+        registry= BookingRegistry(rng=rng)
+
+    lengths= list(stay_lengths)
+    weights= [stay_lengths[length] for length in lengths]
+    average= sum(length*weight for length, weight in zip(lengths, weights))/sum(weights)
+    room_objects= []
+
+    for i in range(rooms):
+        room_type= ROOM_TYPES[i*len(ROOM_TYPES)//rooms]
+        room= Room(room_type, i+1, round(rng.uniform(50, 200), 2))
+
+        for year in years:
+            room.set_up_room_availability(MONTHS, year)
+
+        room_objects.append(room)
+
+    reservations= {}
+
+    if occupancy<=0:
+        return Hotel(name, room_objects, reservations, registry)
+
+    first= datetime.date(min(years), 1, 1).toordinal()
+    last= datetime.date(max(years)+1, 1, 1).toordinal()
+    mean_gap= average*(1-occupancy)/occupancy
+
+    for room in room_objects:
+        night= first+int(rng.expovariate(1/mean_gap)) if mean_gap>0 else first
+
+        while night<last:
+            length= min(rng.choices(lengths, weights)[0], last-night)
+            check_in= datetime.date.fromordinal(night)
+            check_out= datetime.date.fromordinal(night+length)
+            reservation= Reservation(rng.choice(GUESTS), room, check_in, check_out, registry=registry)
+            reservations[reservation.booking_number]= reservation
+            night+= length
+
+            if mean_gap>0:
+                night+= int(rng.expovariate(1/mean_gap))
+
+    return Hotel(name, room_objects, reservations, registry)
+
+
+def main(argv=None):
+    """
+    >>> import filecmp, tempfile
+    >>> cwd = os.getcwd()
+    >>> roots = [tempfile.TemporaryDirectory() for i in range(2)]
+    >>> for root in roots:
+    ...     main(['Black Lodge', '--root', root.name, '--rooms', '4', '--seed', '3'])
+    ...     os.chdir(cwd)
+    Black Lodge: 4 rooms, 112 reservations
+    Black Lodge: 4 rooms, 112 reservations
+    >>> first, second = [os.path.join(root.name, 'hotels', 'black_lodge') for root in roots]
+    >>> sorted(os.listdir(first)) == sorted(os.listdir(second)), filecmp.cmpfiles(first, second, os.listdir(first), shallow=False)[1:]
+    (True, ([], []))
+    >>> for root in roots:
+    ...     root.cleanup()
+    """
+    parser= argparse.ArgumentParser(description="Write synthetic hotels in the hotels/<name>/ format.")
+    parser.add_argument('names', nargs='+', help="hotel names, e.g. 'Black Lodge'")
+    parser.add_argument('--root', default='.', help="folder that holds (or will hold) hotels/")
+    parser.add_argument('--rooms', type=int, default=500)
+    parser.add_argument('--first-year', type=int, default=1975)
+    parser.add_argument('--years', type=int, default=1)
+    parser.add_argument('--occupancy', type=float, default=0.3, help="fraction of room nights booked")
+    parser.add_argument('--stay-lengths', type=parse_stay_lengths, default=None, help="nights:weight pairs, e.g. 1:3,2:4,7:1")
+    parser.add_argument('--seed', type=int, default=None)
+    args= parser.parse_args(argv)
+
+    os.chdir(args.root)
+    rng= random.Random(args.seed)
+    registry= BookingRegistry(rng=rng)
+    years= range(args.first_year, args.first_year+args.years)
+
+    for name in args.names:
+        hotel= generate_hotel(name, args.rooms, years, args.occupancy, args.stay_lengths, rng, registry)
+        hotel.save_hotel()
+        print(name+': '+str(len(hotel.rooms))+' rooms, '+str(len(hotel.reservations))+' reservations')
+
+
+if __name__=='__main__':
+    main()
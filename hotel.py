@@ -3,20 +3,98 @@ import datetime
 import random
 import copy
 import os
+import csv
+import tempfile
+import threading
+import contextlib
 from room import Room, MONTHS, DAYS_PER_MONTH
 from reservation import Reservation
-import doctest
+from availability import IntervalSet
+from inventory import RoomInventory
+from registry import BookingRegistry
+from journal import Journal
+from snapshot import HotelSnapshot, build_snapshot
+from month_cache import MonthCache, months_between, next_month, previous_month
+from calendar_table import CALENDAR
 
 class Hotel:
-    def __init__(self, name, rooms=[], reservations={}):
+    VECTOR_RECEIPT_SIZE= 64
+    
+    def __init__(self, name, rooms=None, reservations=None, registry=None):
         self.name= name
-        self.rooms= copy.deepcopy(rooms)
-        self.reservations= copy.deepcopy(reservations)
         
-    def make_reservation(self, name, type_of_room, check_in, check_out):
+        if rooms==None:
+            rooms=[]
+        
+        if reservations==None:
+            reservations={}
+        
+        self.rooms= rooms
+        self.reservations= reservations
+        self.inventory= RoomInventory(self.rooms)
+        self.month_cache= None
+        self.dirty_months= set()
+        self.info_saved= False
+        self.journal= None
+        self.occupancy= None
+        self.gaps= None
+        self.allocation= 'first-fit'
+        self.extend_months= False
+        self.guest_index= {}
+        self.stay_index= {}
+        self.room_locks= None
+        self.lock= contextlib.nullcontext()
+        self.storage= None
+        
+        for reservation in self.reservations.values():
+            self.index_reservation(reservation)
+        
+        if registry==None:
+            registry= BookingRegistry()
+        
+        self.use_registry(registry)
+    
+    def use_registry(self, registry):
+        """
+        >>> r1 = Room("Queen", 105, 80.0)
+        >>> r1.set_up_room_availability(['May'], 2021)
+        >>> h = Hotel("Secret Nugget Hotel", [r1])
+        >>> num = h.make_reservation("Mrs. Santos", "Queen", datetime.date(2021, 5, 3), datetime.date(2021, 5, 10))
+        >>> shared = BookingRegistry()
+        >>> h.use_registry(shared)
+        >>> num in shared, shared.owner(num) is h
+        (True, True)
+        """
+        for booking_num in self.reservations:
+            registry.assign(booking_num, self)
+        
+        self.registry= registry
+    
+    def snapshot(self):
+        """
+        >>> r1 = Room("Queen", 105, 80.0)
+        >>> r1.set_up_room_availability(['May'], 2021)
+        >>> h = Hotel("Hotel California", [r1])
+        >>> copy_of_h = h.snapshot()
+        >>> date1 = datetime.date(2021, 5, 3)
+        >>> date2 = datetime.date(2021, 5, 10)
+        >>> num1 = copy_of_h.make_reservation("Mrs. Los Santos", "Queen", date1, date2)
+        >>> r1.availability[(2021, 5)][5]
+        True
+        >>> copy_of_h.rooms[0].availability[(2021, 5)][5]
+        False
+        >>> num1 in h.registry
+        False
+        >>> copy_of_h.reservations[num1].room_reserved is copy_of_h.rooms[0]
+        True
+        """
+        rooms, reservations= copy.deepcopy((self.rooms, self.reservations))
+        
+        return Hotel(self.name, rooms, reservations, BookingRegistry(self.registry))
+        
+    def make_reservation(self, name, type_of_room, check_in, check_out, strategy=None):
         """
         >>> random.seed(987)
-        >>> Reservation.booking_numbers = []
         >>> r1 = Room("Queen", 105, 80.0)
         >>> r1.set_up_room_availability(['May'], 2021)
         >>> h = Hotel("Secret Nugget Hotel", [r1])
@@ -30,17 +108,390 @@ class Hotel:
         Room reserved: Room 105,Queen,80.0
         Check-in date: 2021-05-03
         Check-out date: 2021-05-10
+        
+        strategy picks the room when several are free: 'first-fit' takes the
+        first one in list order, 'best-fit' the room with the shortest free
+        gap holding the stay, and 'tight' the room whose gap the stay leaves
+        the smallest remainder on one side of. The last two use the gap index
+        (see gaps.GapIndex). It defaults to the hotel's allocation setting.
+        
+        >>> r2 = Room("Queen", 106, 80.0)
+        >>> r2.set_up_room_availability(['May'], 2021)
+        >>> h = Hotel("Secret Nugget Hotel", [r2, r1])
+        >>> num = h.make_reservation("Mr. Santos", "Queen", datetime.date(2021, 5, 20), datetime.date(2021, 5, 22))
+        >>> h.reservations[num].room_reserved.room_num
+        106
+        >>> num = h.make_reservation("Mr. Santos", "Queen", datetime.date(2021, 5, 10), datetime.date(2021, 5, 12), strategy='tight')
+        >>> h.reservations[num].room_reserved.room_num
+        105
+        >>> h.allocation = 'best-fit'
+        >>> num = h.make_reservation("Mr. Santos", "Queen", datetime.date(2021, 5, 1), datetime.date(2021, 5, 2))
+        >>> h.reservations[num].room_reserved.room_num
+        105
         """
-        available_room= Room.find_available_room(self.rooms, type_of_room, check_in, check_out)
+        if strategy==None:
+            strategy= self.allocation
+        
+        if self.extend_months and check_in<check_out:
+            self.open_months(check_in, check_out)
+        
+        if self.room_locks!=None:
+            return self.make_reservation_locked(name, type_of_room, check_in, check_out, strategy)
+        
+        available_room= self.find_available_room(type_of_room, check_in, check_out, strategy)
         
         if available_room==None:
             raise AssertionError("No rooms of this type are available")
         
-        booked_room= Reservation(name, available_room, check_in, check_out)
-        self.reservations[booked_room.booking_number]= booked_room
+        booked_room= Reservation(name, available_room, check_in, check_out, registry=self.registry)
+        
+        try:
+            self.commit_reservation(booked_room)
+        
+        except BaseException:
+            self.undo_reservations([booked_room])
+            raise
         
         return booked_room.booking_number
+    
+    def make_reservation_locked(self, name, type_of_room, check_in, check_out, strategy='first-fit'):
+        if check_in>check_out:
+            raise AssertionError("The first date is not an earlier date than the second")
+        
+        if self.inventory.has_capacity(type_of_room, check_in, check_out):
+            
+            for room in self.candidate_rooms(type_of_room, check_in, check_out, strategy):
+                
+                with self.room_locks[room.room_num]:
+                    
+                    if not room.is_available(check_in, check_out):
+                        continue
+                    
+                    booked_room= Reservation(name, room, check_in, check_out, registry=self.registry)
+                
+                try:
+                    self.commit_reservation(booked_room)
+                
+                except BaseException:
+                    
+                    with self.room_locks[room.room_num]:
+                        room.release_range(check_in, check_out)
+                    
+                    self.registry.release(booked_room.booking_number)
+                    raise
+                
+                return booked_room.booking_number
+        
+        raise AssertionError("No rooms of this type are available")
+    
+    def candidate_rooms(self, type_of_room, check_in, check_out, strategy):
+        if strategy=='first-fit':
+            yield from self.inventory.rooms_of_type(type_of_room)
+            return
+        
+        room= self.gap_index().choose(type_of_room, check_in, check_out, strategy)
+        
+        while room!=None:
+            yield room
+            room= self.gap_index().choose(type_of_room, check_in, check_out, strategy)
+    
+    def commit_reservation(self, booked_room):
+        self.commit_reservations([booked_room])
+    
+    def commit_reservations(self, booked_rooms):
+        with self.lock:
+            
+            if self.storage!=None:
+                self.storage.record_make(self, booked_rooms)
+            
+            for booked_room in booked_rooms:
+                self.record_reservation(booked_room)
+                self.dirty_months.update(CALENDAR.months_between(booked_room.check_in_ordinal, booked_room.check_out_ordinal))
+                
+                if self.journal!=None:
+                    self.journal.append_make(booked_room)
+    
+    def undo_reservations(self, booked_rooms):
+        for booked_room in booked_rooms:
+            booked_room.room_reserved.release_range(booked_room.check_in, booked_room.check_out)
+            self.registry.release(booked_room.booking_number)
+    
+    def enable_locking(self):
+        """
+        Switches the hotel to concurrent mode: every month is loaded, each
+        room gets its own lock, and the reservation indexes, dirty months and
+        journal are guarded by one hotel lock. A reservation locks only the
+        room it is placed in, so bookings of different rooms run in parallel.
+        
+        >>> import sys, threading
+        >>> rooms = [Room("Queen", 100+i, 80.0) for i in range(4)]
+        >>> for r in rooms:
+        ...     r.set_up_room_availability(['May', 'Jun'], 2021)
+        >>> h = Hotel("Secret Nugget Hotel", rooms)
+        >>> h.enable_locking()
+        >>> switch = sys.getswitchinterval()
+        >>> sys.setswitchinterval(1e-6)
+        >>> def guest(seed):
+        ...     rng = random.Random(seed)
+        ...     mine = []
+        ...     for i in range(150):
+        ...         check_in = datetime.date(2021, 5, 1)+datetime.timedelta(days=rng.randrange(55))
+        ...         try:
+        ...             mine.append(h.make_reservation("Guest", "Queen", check_in, check_in+datetime.timedelta(days=rng.randrange(1, 6))))
+        ...         except AssertionError:
+        ...             pass
+        ...         if mine and rng.random()<0.3:
+        ...             h.cancel_reservation(mine.pop(rng.randrange(len(mine))))
+        >>> threads = [threading.Thread(target=guest, args=(seed,)) for seed in range(16)]
+        >>> for t in threads:
+        ...     t.start()
+        >>> for t in threads:
+        ...     t.join()
+        >>> sys.setswitchinterval(switch)
+        >>> nights = {}
+        >>> for rsv in h.reservations.values():
+        ...     for night in range(rsv.check_in.toordinal(), rsv.check_out.toordinal()):
+        ...         nights.setdefault((rsv.room_reserved.room_num, night), []).append(rsv.booking_number)
+        >>> max(len(nums) for nums in nights.values())
+        1
+        >>> all(sorted(n for s, e in r.availability.booked for n in range(s, e)) == sorted(n for num, n in nights if num == r.room_num) for r in rooms)
+        True
+        >>> set(h.registry) == set(h.reservations)
+        True
+        >>> free = h.inventory.free_nights['Queen']
+        >>> all(free[night] == 4-sum(1 for r in rooms if (r.room_num, night) in nights) for night in free)
+        True
+        """
+        self.load_all_months()
+        self.room_locks= {room.room_num: threading.Lock() for room in self.rooms}
+        self.lock= threading.RLock()
+        self.inventory.lock= threading.Lock()
+        self.registry.enable_locking()
+        
+        if self.gaps!=None:
+            self.gaps.lock= threading.Lock()
+    
+    def locked_rooms(self, rooms):
+        stack= contextlib.ExitStack()
+        
+        if self.room_locks!=None:
+            
+            for room in sorted(rooms, key=lambda room: room.room_num):
+                stack.enter_context(self.room_locks[room.room_num])
+        
+        return stack
+    
+    def make_reservations(self, requests, atomic=True):
+        """
+        >>> random.seed(987)
+        >>> r1 = Room("Queen", 105, 80.0)
+        >>> r2 = Room("Queen", 107, 80.0)
+        >>> r3 = Room("Twin", 101, 55.0)
+        >>> for r in (r1, r2, r3):
+        ...     r.set_up_room_availability(['May'], 2021)
+        >>> h = Hotel("Secret Nugget Hotel", [r1, r2, r3])
+        >>> requests = [("Jack", "Queen", datetime.date(2021, 5, 3), datetime.date(2021, 5, 10)),
+        ...             ("Wendy", "Twin", datetime.date(2021, 5, 3), datetime.date(2021, 5, 10)),
+        ...             ("Danny", "Queen", datetime.date(2021, 5, 5), datetime.date(2021, 5, 12)),
+        ...             ("Dick", "Queen", datetime.date(2021, 5, 1), datetime.date(2021, 5, 6))]
+        >>> booking_nums, failures = h.make_reservations(requests)
+        >>> booking_nums, failures
+        ([None, None, None, None], {2: 'No rooms of this type are available'})
+        >>> len(h.reservations)
+        0
+        >>> booking_nums, failures = h.make_reservations(requests, atomic=False)
+        >>> failures
+        {2: 'No rooms of this type are available'}
+        >>> [h.reservations[num].room_reserved.room_num for num in booking_nums if num != None]
+        [107, 101, 105]
+        """
+        with self.locked_rooms(self.rooms):
+            return self.place_reservations(requests, atomic)
+    
+    def place_reservations(self, requests, atomic):
+        order= sorted(range(len(requests)), key=lambda i: (requests[i][1], requests[i][2], requests[i][3]))
+        month_tuples= set()
+        planned= {}
+        assignments= {}
+        failures= {}
+        
+        for name, type_of_room, check_in, check_out in requests:
+            
+            if check_in<check_out:
+                month_tuples.update(months_between(check_in, check_out))
+        
+        self.ensure_month_tuples(month_tuples)
+        
+        if self.extend_months:
+            self.open_month_tuples(month_tuples)
+        
+        for i in order:
+            name, type_of_room, check_in, check_out= requests[i]
+            
+            if check_in>=check_out:
+                failures[i]= "The first date is not an earlier date than the second"
+                continue
+            
+            start, end= check_in.toordinal(), check_out.toordinal()
+            assigned= None
+            
+            if self.inventory.has_capacity(type_of_room, check_in, check_out):
+                
+                for room in self.inventory.rooms_of_type(type_of_room):
+                    
+                    if room.room_num in planned and planned[room.room_num].overlaps(start, end):
+                        continue
+                    
+                    if room.availability.is_free(start, end):
+                        assigned= room
+                        break
+            
+            if assigned==None:
+                failures[i]= "No rooms of this type are available"
+                continue
+            
+            planned.setdefault(assigned.room_num, IntervalSet()).add(start, end)
+            assignments[i]= assigned
+        
+        booking_nums= [None]*len(requests)
+        
+        if atomic and len(failures)!=0:
+            return booking_nums, failures
+        
+        committed= []
+        
+        try:
+            for i in sorted(assignments):
+                name, type_of_room, check_in, check_out= requests[i]
+                booked_room= Reservation(name, assignments[i], check_in, check_out, registry=self.registry)
+                committed.append(booked_room)
+                booking_nums[i]= booked_room.booking_number
+        
+            self.commit_reservations(committed)
+        
+        except BaseException:
+            self.undo_reservations(committed)
+            raise
+        
+        return booking_nums, failures
+    
+    def find_available_room(self, type_of_room, check_in, check_out, strategy='first-fit'):
+        self.ensure_months(check_in, check_out)
+        
+        if strategy=='first-fit':
+            return self.inventory.find_available_room(type_of_room, check_in, check_out)
+        
+        if check_in>check_out:
+            raise AssertionError("The first date is not an earlier date than the second")
+        
+        return self.gap_index().choose(type_of_room, check_in, check_out, strategy)
+    
+    def open_months(self, check_in, check_out):
+        """
+        Sets up every room for the months of the stay that the hotel has no
+        availability for yet, so that with extend_months set a booking past
+        the end of the calendar opens new months instead of being refused.
+        The new months are marked dirty and saved with the hotel.
+        
+        >>> r1 = Room("Queen", 105, 80.0)
+        >>> r1.set_up_room_availability(['Dec'], 2021)
+        >>> h = Hotel("Secret Nugget Hotel", [r1])
+        >>> date1 = datetime.date(2021, 12, 30)
+        >>> date2 = datetime.date(2022, 1, 3)
+        >>> h.make_reservation("Jack", "Queen", date1, date2)
+        Traceback (most recent call last):
+        AssertionError: No rooms of this type are available
+        >>> h.extend_months = True
+        >>> num = h.make_reservation("Jack", "Queen", date1, date2)
+        >>> sorted(r1.availability), sorted(h.dirty_months)
+        ([(2021, 12), (2022, 1)], [(2021, 12), (2022, 1)])
+        >>> r1.availability[(2022, 1)][2], r1.availability[(2022, 1)][3]
+        (False, True)
+        
+        Room locks are only taken when a month is actually missing, so this
+        returns while another booking holds the room:
+        
+        >>> h.enable_locking()
+        >>> with h.room_locks[105]:
+        ...     h.open_months(date1, date2)
+        """
+        month_tuples= CALENDAR.months_between(check_in.toordinal(), check_out.toordinal())
+        self.ensure_month_tuples(month_tuples)
+        
+        if len(self.missing_months(month_tuples))==0:
+            return
+        
+        with self.locked_rooms(self.rooms):
+            self.open_month_tuples(month_tuples)
+    
+    def missing_months(self, month_tuples):
+        if len(self.rooms)==0:
+            return []
+        
+        return [month_tuple for month_tuple in month_tuples if month_tuple not in self.rooms[0].availability]
+    
+    def open_month_tuples(self, month_tuples):
+        self.ensure_month_tuples(month_tuples)
+        
+        with self.lock:
+            
+            for year, month in sorted(self.missing_months(month_tuples)):
+                
+                for room_obj in self.rooms:
+                    room_obj.set_up_room_availability([MONTHS[month-1]], year)
+                
+                self.dirty_months.add((year, month))
+                
+                if self.month_cache!=None:
+                    self.month_cache.on_disk.add((year, month))
+                    self.month_cache.add((year, month))
+    
+    def gap_index(self):
+        if self.gaps==None:
+            from gaps import GapIndex
+            
+            self.gaps= GapIndex(self.rooms)
+            
+            if self.room_locks!=None:
+                self.gaps.lock= threading.Lock()
+        
+        return self.gaps
         
+    def search_availability(self, check_in, check_out, room_types=None):
+        """
+        >>> r1 = Room("Queen", 105, 80.0)
+        >>> r2 = Room("Queen", 107, 75.0)
+        >>> r1.set_up_room_availability(['May'], 2021)
+        >>> r2.set_up_room_availability(['May'], 2021)
+        >>> h = Hotel("Secret Nugget Hotel", [r1, r2])
+        >>> date1 = datetime.date(2021, 5, 3)
+        >>> date2 = datetime.date(2021, 5, 10)
+        >>> h.search_availability(date1, date2)
+        {'Queen': (2, 75.0)}
+        >>> num = h.make_reservation("Mrs. Santos", "Queen", date1, date2)
+        >>> h.search_availability(date1, date2)
+        {'Queen': (1, 75.0)}
+        """
+        if check_in>=check_out:
+            raise AssertionError("The first date is not an earlier date than the second")
+        
+        self.ensure_months(check_in, check_out)
+        
+        return self.occupancy_matrix().summary(check_in, check_out, room_types)
+    
+    def occupancy_matrix(self):
+        if self.occupancy!=None and not self.occupancy.stale:
+            return self.occupancy
+        
+        from occupancy import OccupancyMatrix
+        
+        if self.occupancy!=None:
+            self.occupancy.detach()
+        
+        self.occupancy= OccupancyMatrix(self.rooms)
+        
+        return self.occupancy
+    
     def get_receipt(self, booking_nums):
         """
         >>> r1 = Room("Queen", 105, 80.0)
@@ -63,18 +514,35 @@ class Hotel:
         
         >>> h.get_receipt([123])
         0.0
+        
+        >>> round(h.get_receipt([num1, num2, 123]*30), 2)
+        71250.0
         """
+        if len(booking_nums)>=Hotel.VECTOR_RECEIPT_SIZE:
+            from reports import ReservationColumns
+            
+            reservations= []
+            
+            for booking_num in booking_nums:
+                reservation= self.find_reservation(booking_num)
+                
+                if reservation!=None:
+                    reservations.append(reservation)
+            
+            return ReservationColumns(self.rooms, reservations).total_revenue()
+        
         total=0.0
         
         for booking_num in booking_nums:
+            reservation= self.find_reservation(booking_num)
             
-            if booking_num not in self.reservations:
+            if reservation==None:
                 continue
             
-            date1= self.reservations[booking_num].check_in
-            date2= self.reservations[booking_num].check_out
+            date1= reservation.check_in
+            date2= reservation.check_out
             days_stayed= (date2-date1).days
-            price_for_room= days_stayed*self.reservations[booking_num].room_reserved.price
+            price_for_room= days_stayed*reservation.room_reserved.price
             
             total+=price_for_room
         
@@ -83,7 +551,6 @@ class Hotel:
     def get_reservation_for_booking_number(self, booking_num):
         """
         >>> random.seed(137)
-        >>> Reservation.booking_numbers = []
         >>> r1 = Room("Queen", 105, 80.0)
         >>> r1.set_up_room_availability(['May'], 2021)
         >>> h = Hotel("Secret Nugget Hotel", [r1])
@@ -98,47 +565,279 @@ class Hotel:
         Check-in date: 2021-05-03
         Check-out date: 2021-05-10
         """
-        return self.reservations[booking_num]
+        reservation= self.find_reservation(booking_num)
+        
+        if reservation==None:
+            raise KeyError(booking_num)
+        
+        return reservation
+    
+    def find_reservation(self, booking_num):
+        """
+        >>> hotel = Hotel.load_hotel('overlook_hotel', lazy=True, max_months=2)
+        >>> len(hotel.reservations)
+        0
+        >>> print(hotel.find_reservation(9998701091820).check_out)
+        1975-12-24
+        >>> sorted(hotel.month_cache.loaded)
+        [(1975, 10), (1975, 11), (1975, 12)]
+        >>> print(hotel.find_reservation(123))
+        None
+        """
+        if booking_num in self.reservations:
+            reservation= self.reservations[booking_num]
+            
+            if self.month_cache!=None:
+                
+                for month_tuple in CALENDAR.months_between(reservation.check_in_ordinal, reservation.check_out_ordinal):
+                    self.month_cache.touch(month_tuple)
+            
+            return reservation
+        
+        if self.month_cache==None:
+            return None
+        
+        for month_tuple in self.month_cache.unloaded():
+            
+            if not self.month_cache.needs_loading(month_tuple):
+                continue
+            
+            group= self.load_months([month_tuple])
+            self.evict_months(group)
+            
+            if booking_num in self.reservations:
+                return self.reservations[booking_num]
+        
+        return None
+    
+    @staticmethod
+    def normalize_name(name):
+        return ' '.join(name.lower().split())
+    
+    def index_reservation(self, reservation):
+        key= Hotel.normalize_name(reservation.name)
+        self.guest_index.setdefault(key, set()).add(reservation.booking_number)
+        self.stay_index.setdefault(reservation.room_reserved.room_num, {})[reservation.check_in_ordinal]= reservation.booking_number
+    
+    def unindex_reservation(self, reservation):
+        key= Hotel.normalize_name(reservation.name)
+        booking_nums= self.guest_index.get(key, set())
+        booking_nums.discard(reservation.booking_number)
+        
+        if len(booking_nums)==0:
+            self.guest_index.pop(key, None)
+        
+        self.stay_index.get(reservation.room_reserved.room_num, {}).pop(reservation.check_in_ordinal, None)
+    
+    def find_by_guest(self, name):
+        """
+        >>> random.seed(137)
+        >>> r1 = Room("Queen", 105, 80.0)
+        >>> r1.set_up_room_availability(['May'], 2021)
+        >>> h = Hotel("Secret Nugget Hotel", [r1])
+        >>> num1 = h.make_reservation("Mrs. Santos", "Queen", datetime.date(2021, 5, 3), datetime.date(2021, 5, 10))
+        >>> num2 = h.make_reservation("Mr. Santos", "Queen", datetime.date(2021, 5, 10), datetime.date(2021, 5, 12))
+        >>> [rsv.booking_number == num1 for rsv in h.find_by_guest("  mrs.  SANTOS ")]
+        [True]
+        >>> h.cancel_reservation(num1)
+        >>> h.find_by_guest("Mrs. Santos"), h.guest_index == {'mr. santos': {num2}}
+        ([], True)
+        """
+        booking_nums= self.guest_index.get(Hotel.normalize_name(name), ())
+        
+        return [self.reservations[booking_num] for booking_num in booking_nums]
+    
+    def find_by_stay(self, room_num, check_in):
+        """
+        >>> hotel = Hotel.load_hotel('overlook_hotel', lazy=True, max_months=2)
+        >>> print(hotel.find_by_stay(237, datetime.date(1975, 10, 30)).name)
+        Jack
+        >>> print(hotel.find_by_stay(237, datetime.date(1975, 10, 31)))
+        None
+        """
+        if self.month_cache!=None:
+            self.ensure_month_tuples([CALENDAR.month_of(check_in.toordinal())])
+        
+        booking_num= self.stay_index.get(room_num, {}).get(check_in.toordinal())
+        
+        if booking_num==None:
+            return None
+        
+        return self.find_reservation(booking_num)
+    
+    def record_reservation(self, reservation):
+        self.reservations[reservation.booking_number]= reservation
+        self.index_reservation(reservation)
+        self.registry.assign(reservation.booking_number, self)
+        
+        if self.month_cache!=None:
+            
+            for month_tuple in CALENDAR.months_between(reservation.check_in_ordinal, reservation.check_out_ordinal):
+                self.month_cache.bookings.setdefault(month_tuple, set()).add(reservation.booking_number)
+    
+    def forget_reservation(self, booking_num):
+        reservation= self.reservations.pop(booking_num)
+        self.unindex_reservation(reservation)
+        
+        if self.month_cache!=None:
+            
+            for month_tuple in CALENDAR.months_between(reservation.check_in_ordinal, reservation.check_out_ordinal):
+                self.month_cache.bookings.get(month_tuple, set()).discard(booking_num)
+        
+        return reservation
     
     def cancel_reservation(self, booking_num):
         """
         >>> random.seed(137)
-        >>> Reservation.booking_numbers = []
         >>> r1 = Room("Queen", 105, 80.0)
         >>> r1.set_up_room_availability(['May'], 2021)
         >>> h = Hotel("Hotel California", [r1])
-        >>> r1.availability[(2021, 5)][5]
-        True
-        >>> h.rooms[0].availability[(2021, 5)][5]
+        >>> h.rooms[0] is r1
         True
         >>> date1 = datetime.date(2021, 5, 3)
         >>> date2 = datetime.date(2021, 5, 10)
         >>> num1 = h.make_reservation("Mrs. Los Santos", "Queen", date1, date2)
         >>> r1.availability[(2021, 5)][5]
-        True
-        >>> h.rooms[0].availability[(2021, 5)][5]
         False
         >>> h.cancel_reservation(num1)
         >>> r1.availability[(2021, 5)][5]
         True
-        >>> h.rooms[0].availability[(2021, 5)][5]
-        True
+        >>> num1 in h.registry
+        False
         """
-        try:
-            date1= self.reservations[booking_num].check_in
+        reservation= self.find_reservation(booking_num)
         
-        except KeyError:
+        if reservation==None:
             return
         
-        date2= self.reservations[booking_num].check_out
-        days_stayed= (date2-date1).days
+        with self.lock:
+            
+            if self.reservations.get(booking_num) is not reservation:
+                return
+            
+            if self.storage!=None:
+                self.storage.record_cancel(self, [reservation])
+            
+            self.forget_reservation(booking_num)
+        
+        start= reservation.check_in_ordinal
+        end= reservation.check_out_ordinal
+        room= reservation.room_reserved
+        
+        with self.locked_rooms([room]):
+            room.availability.release(start, end)
+        
+        self.registry.release(booking_num)
+        
+        with self.lock:
+            self.dirty_months.update(CALENDAR.months_between(start, end))
+            
+            if self.journal!=None:
+                self.journal.append_cancel(reservation)
+        
+    def cancel_reservations(self, booking_nums):
+        """
+        Cancels every booking number found and returns how many were
+        cancelled. Nights are released as whole ranges, merged per room.
+        
+        >>> random.seed(137)
+        >>> r1 = Room("Queen", 105, 80.0)
+        >>> r1.set_up_room_availability(['May', 'Jun'], 2021)
+        >>> h = Hotel("Hotel California", [r1])
+        >>> num1 = h.make_reservation("Jack", "Queen", datetime.date(2021, 5, 3), datetime.date(2021, 5, 10))
+        >>> num2 = h.make_reservation("Wendy", "Queen", datetime.date(2021, 5, 10), datetime.date(2021, 6, 2))
+        >>> h.dirty_months.clear()
+        >>> h.cancel_reservations([num1, num2, num1, 123])
+        2
+        >>> list(r1.availability.booked), len(h.reservations), len(h.registry), h.guest_index, h.stay_index
+        ([], 0, 0, {}, {105: {}})
+        >>> sorted(h.dirty_months)
+        [(2021, 5), (2021, 6)]
+        """
+        if self.month_cache!=None:
+            cancelled= 0
+            
+            for booking_num in dict.fromkeys(booking_nums):
+                reservation= self.find_reservation(booking_num)
+                
+                if reservation!=None:
+                    cancelled+= self.release_reservations([reservation])
+            
+            return cancelled
+        
+        reservations= []
+        
+        for booking_num in dict.fromkeys(booking_nums):
+            
+            if booking_num in self.reservations:
+                reservations.append(self.reservations[booking_num])
+        
+        return self.release_reservations(reservations)
+    
+    def purge(self, matches):
+        """
+        Cancels every reservation for which matches(reservation) is true and
+        returns how many were cancelled. Hotel.ended_before(date) and
+        Hotel.in_room(room_num) build the usual filters. A lazily loaded
+        hotel is fully loaded first.
+        
+        >>> hotel = Hotel.load_hotel('the_great_northern_hotel')
+        >>> hotel.purge(Hotel.ended_before(datetime.date(1989, 1, 1)))
+        0
+        >>> hotel.purge(Hotel.in_room(315)), len(hotel.reservations), sorted(hotel.dirty_months)[:2]
+        (1, 0, [(1989, 1), (1989, 2)])
+        """
+        self.load_all_months()
         
-        for day in range(days_stayed):
-            date= date1+datetime.timedelta(day)
-            self.reservations[booking_num].room_reserved.make_available(date)
+        return self.release_reservations([reservation for reservation in self.reservations.values() if matches(reservation)])
+    
+    @staticmethod
+    def ended_before(date):
+        ordinal= date.toordinal()
+        
+        return lambda reservation: reservation.check_out_ordinal<=ordinal
+    
+    @staticmethod
+    def in_room(room_num):
+        return lambda reservation: reservation.room_reserved.room_num==room_num
+    
+    def release_reservations(self, reservations):
+        with self.lock:
+            reservations= [reservation for reservation in reservations if self.reservations.get(reservation.booking_number) is reservation]
+            
+            if len(reservations)==0:
+                return 0
+            
+            if self.storage!=None:
+                self.storage.record_cancel(self, reservations)
+            
+            for reservation in reservations:
+                self.forget_reservation(reservation.booking_number)
+        
+        ranges_by_room= {}
+        
+        for reservation in reservations:
+            ranges_by_room.setdefault(reservation.room_reserved, IntervalSet()).add(reservation.check_in_ordinal, reservation.check_out_ordinal)
+        
+        for room, ranges in ranges_by_room.items():
+            
+            with self.locked_rooms([room]):
+                
+                for start, end in ranges:
+                    room.availability.release(start, end)
         
-        del self.reservations[booking_num]
+        self.registry.release_many([reservation.booking_number for reservation in reservations])
         
+        with self.lock:
+            
+            for reservation in reservations:
+                self.dirty_months.update(CALENDAR.months_between(reservation.check_in_ordinal, reservation.check_out_ordinal))
+                
+                if self.journal!=None:
+                    self.journal.append_cancel(reservation)
+        
+        return len(reservations)
+    
     def get_available_room_types(self):
         """
         >>> r1 = Room("Queen", 105, 80.0)
@@ -153,15 +852,7 @@ class Hotel:
         >>> types
         ['Queen', 'Twin']
         """
-        room_types=[]
-        for room in self.rooms:
-            
-            if room.room_type in room_types:
-                continue
-            
-            room_types.append(room.room_type)
-        
-        return room_types
+        return self.inventory.room_types()
     
     @staticmethod
     def load_hotel_info_file(filename):
@@ -194,6 +885,15 @@ class Hotel:
         
         return hotel_name, rooms
     
+    @staticmethod
+    def read_hotel_name(filename):
+        """
+        >>> Hotel.read_hotel_name('overlook_hotel')
+        'Overlook Hotel'
+        """
+        with open('hotels/'+filename+'/hotel_info.txt', 'r') as fobj:
+            return fobj.readline().rstrip('\n')
+    
     def save_hotel_info_file(self):
         """
         >>> r1 = Room("Double", 101, 99.99)
@@ -205,54 +905,76 @@ class Hotel:
         'Queen Elizabeth Hotel\\nRoom 101,Double,99.99\\n'
         >>> fobj.close()
         """
-        folder= self.name.lower()
-        folder= folder.replace(" ", "_")
-        filename= "hotel_info.txt"
-        fobj= open('hotels/'+folder+"/"+filename, 'w', encoding = 'utf-8')
+        lines= [self.name+'\n']
         
         for room in self.rooms:  
-            fobj.write(self.name+'\n'+str(room)+'\n')
+            lines.append(str(room)+'\n')
         
-        fobj.close()
+        self.write_atomically('hotels/'+self.folder_name()+"/hotel_info.txt", ''.join(lines))
+        self.info_saved= True
     
     @staticmethod
     def load_reservation_strings_for_month(folder, month, year):
+        """
+        >>> rows = Hotel.load_reservation_strings_for_month('overlook_hotel', 'Oct', 1975)
+        >>> len(rows), len(rows[237])
+        (500, 31)
+        >>> rows[237][0], rows[237][29]
+        ((1975, 'Oct', 1, ''), (1975, 'Oct', 30, '9998701091820--Jack'))
+        """
         final_dict= {}
         filename= str(year)+"_"+month+".csv"
-        fobj = open('hotels/'+folder+"/"+filename, 'r')
-        day_in_month=1
         
-        for row in fobj:
-            list_of_days=[]
-            row= row.strip('\n')
-            row_content= row.split(",")
-            room_num= int(row_content[0])
+        with open('hotels/'+folder+"/"+filename, 'r', newline='') as fobj:
             
-            for day in row_content:
+            for row in csv.reader(fobj):
                 
-                if day== str(room_num):
+                if len(row)==0:
                     continue
                 
-                if day=="":
-                    list_of_days.append((year, month, row_content.index(day), ""))
-                    row_content.insert(row_content.index(day), None)
-                    row_content.remove(day)
+                list_of_days=[]
                 
-                else:
-                    list_of_days.append((year, month, row_content.index(day), day))
-                    row_content.insert(row_content.index(day), None)
-                    row_content.remove(day)
-            
-            final_dict[room_num]= list_of_days
+                for day, short_string in enumerate(row[1:], 1):
+                    list_of_days.append((year, month, day, short_string))
+                
+                final_dict[int(row[0])]= list_of_days
         
         return final_dict
+    
+    @staticmethod
+    def iter_reservation_cells(folder, month, year):
+        """
+        Yields (room number, date ordinal, cell) for every booked cell.
+        
+        >>> cells = Hotel.iter_reservation_cells('overlook_hotel', 'Oct', 1975)
+        >>> room_num, night, cell = next(cells)
+        >>> room_num, datetime.date.fromordinal(night), cell
+        (237, datetime.date(1975, 10, 30), '9998701091820--Jack')
+        >>> len(list(cells))
+        1
+        """
+        filename= str(year)+"_"+month+".csv"
+        first= CALENDAR.month_start(year, MONTHS.index(month)+1)-1
+        
+        with open('hotels/'+folder+"/"+filename, 'r', newline='') as fobj:
+            
+            for row in csv.reader(fobj):
+                
+                if len(row)==0:
+                    continue
+                
+                room_num= int(row[0])
+                
+                for day, short_string in enumerate(row[1:], 1):
+                    
+                    if short_string!="":
+                        yield room_num, first+day, short_string
 
-    def save_reservations_for_month(self, month, year):
+    def save_reservations_for_month(self, month, year, reservations=None):
         """
         >>> random.seed(987)
         >>> r1 = Room("Double", 237, 99.99)
         >>> r1.set_up_room_availability(['Oct', 'Nov', 'Dec'], 2021)
-        >>> Reservation.booking_numbers = []
         >>> h = Hotel("Queen Elizabeth Hotel", [r1], {})
         >>> date1 = datetime.date(2021, 10, 30)
         >>> date2 = datetime.date(2021, 12, 23)
@@ -262,44 +984,126 @@ class Hotel:
         >>> fobj.read()
         '237,,,,,,,,,,,,,,,,,,,,,,,,,,,,,,1953400675629--Jack,1953400675629--Jack\\n'
         >>> fobj.close()
+        
+        >>> r2 = Room("Twin", 238, 59.99)
+        >>> r2.set_up_room_availability(['Oct', 'Nov', 'Dec'], 2021)
+        >>> h = Hotel("Queen Elizabeth Hotel", [r1, r2], {})
+        >>> num = h.make_reservation("Danny", "Twin", datetime.date(2021, 12, 30), datetime.date(2022, 1, 1))
+        >>> h.save_reservations_for_month('Dec', 2021)
+        >>> fobj = open('hotels/queen_elizabeth_hotel/2021_Dec.csv', 'r')
+        >>> rows = fobj.read().split('\\n')
+        >>> rows[0]
+        '237,,,,,,,,,,,,,,,,,,,,,,,,,,,,,,,'
+        >>> rows[1] == '238'+','*30+str(num)+'--Danny,'+str(num)+'--Danny'
+        True
+        >>> fobj.close()
         """
-        folder= self.name.lower()
-        folder= folder.replace(" ", "_")
-        filename= str(year)+'_'+month+'.csv'
-        fobj= open('hotels/'+folder+"/"+filename, 'w', encoding = 'utf-8')
+        first, days= CALENDAR.month_range(year, MONTHS.index(month)+1)
+        cells= {}
         
-        for booking_num in self.reservations:
-            nights_in_month= self.reservations[booking_num].room_reserved.availability[(year, MONTHS.index(month)+1)]
-            nights_in_month_copy= copy.deepcopy(nights_in_month)
-            name= self.reservations[booking_num].to_short_string()
-            num=self.reservations[booking_num].room_reserved.room_num
-            str_to_write=str(num)+','
+        if reservations==None:
+            reservations= self.reservations.values()
         
-        for night in nights_in_month:
+        for reservation in reservations:
+            start= max(reservation.check_in_ordinal, first)
+            end= min(reservation.check_out_ordinal, first+days)
             
-            if night== None:
+            if start>=end:
                 continue
             
-            elif night:
-                str_to_write= str_to_write+','
+            room_num= reservation.room_reserved.room_num
             
-            elif not night:
-                
-                if nights_in_month_copy.index(night)==len(nights_in_month)-1:
-                    str_to_write= str_to_write+name+'\n'
+            if room_num not in cells:
+                cells[room_num]= [""]*days
+            
+            short_string= reservation.to_short_string()
+            
+            for night in range(start, end):
+                cells[room_num][night-first]= short_string
+        
+        empty_row= ","*days
+        lines= []
+        
+        for room in self.rooms:
+            
+            if room.room_num in cells:
+                lines.append(str(room.room_num)+","+",".join(cells[room.room_num])+"\n")
+            
+            else:
+                lines.append(str(room.room_num)+empty_row+"\n")
+        
+        filename= str(year)+'_'+month+'.csv'
+        self.write_atomically('hotels/'+self.folder_name()+"/"+filename, ''.join(lines))
+    
+    def reservations_by_month(self, month_tuples):
+        by_month= {month_tuple: [] for month_tuple in month_tuples}
+        
+        for reservation in self.reservations.values():
+            
+            for month_tuple in CALENDAR.months_between(reservation.check_in_ordinal, reservation.check_out_ordinal):
                 
-                else:
-                    str_to_write= str_to_write+name+','
-                    nights_in_month_copy.remove(night)
-                    nights_in_month_copy.insert(0, None)
+                if month_tuple in by_month:
+                    by_month[month_tuple].append(reservation)
         
-        fobj.write(str_to_write)
-        fobj.close()
+        return by_month
+    
+    def months_to_save(self):
+        """
+        >>> r1 = Room("Double", 237, 99.99)
+        >>> r1.set_up_room_availability(['Oct', 'Nov'], 2021)
+        >>> h = Hotel("Queen Elizabeth Hotel", [r1], {})
+        >>> h.save_hotel()
+        >>> h.months_to_save()
+        []
+        >>> num = h.make_reservation("Jack", "Double", datetime.date(2021, 11, 2), datetime.date(2021, 11, 4))
+        >>> h.months_to_save()
+        [(2021, 11)]
+        """
+        month_tuples= set(self.dirty_months)
+        set_up= set()
+        
+        for room in self.rooms:
+            set_up.update(room.availability)
+        
+        for year, month in set_up:
+            filename= 'hotels/'+self.folder_name()+'/'+str(year)+'_'+MONTHS[month-1]+'.csv'
+            
+            if not os.path.exists(filename):
+                month_tuples.add((year, month))
+        
+        return sorted(month_tuples)
+    
+    @staticmethod
+    def write_atomically(filename, text):
+        folder= os.path.dirname(filename)
+        fd, temp_name= tempfile.mkstemp(dir=folder, prefix='.'+os.path.basename(filename)+'.', suffix='.tmp')
+        
+        try:
+            if isinstance(text, bytes):
+                fobj= os.fdopen(fd, 'wb')
+            
+            else:
+                fobj= os.fdopen(fd, 'w', encoding = 'utf-8')
+            
+            with fobj:
+                fobj.write(text)
+                fobj.flush()
+                os.fsync(fobj.fileno())
+            
+            os.replace(temp_name, filename)
+        
+        except BaseException:
+            os.remove(temp_name)
+            raise
+    
+    def folder_name(self):
+        folder= self.name.lower()
+        
+        return folder.replace(" ", "_")
     
     def save_hotel(self):
         """
         >>> random.seed(987)
-        >>> Reservation.booking_numbers = []
         >>> r1 = Room("Double", 237, 99.99)
         >>> r1.set_up_room_availability(['Oct', 'Nov', 'Dec'], 2021)
         >>> h = Hotel("Queen Elizabeth Hotel", [r1], {})
@@ -319,29 +1123,237 @@ class Hotel:
         '237,,,,,,,,,,,,,,,,,,,,,,,,,,,,,,1953400675629--Jack,1953400675629--Jack\\n'
         >>> fobj.close()
         """
-        hotel_filename= self.name.lower()
-        hotel_filename= hotel_filename.replace(" ", "_")
-        filename= 'hotels/'+ hotel_filename
+        if self.storage!=None:
+            self.storage.save(self)
+            self.dirty_months.clear()
+        
+        else:
+            self.save_month_files()
+        
+        self.discard_journal()
+    
+    def save_month_files(self):
+        filename= 'hotels/'+ self.folder_name()
         
         if not os.path.exists(filename):
             os.makedirs(filename)
         
-        self.save_hotel_info_file()
+        if not self.info_saved:
+            self.save_hotel_info_file()
+        
+        month_tuples= self.months_to_save()
+        by_month= self.reservations_by_month(month_tuples)
+        
+        for year, month in month_tuples:
+            self.save_reservations_for_month(MONTHS[month-1], year, by_month[(year, month)])
+        
+        self.dirty_months.clear()
+    
+    def save_snapshot(self):
+        """
+        >>> hotel = Hotel.load_hotel('overlook_hotel')
+        >>> hotel.save_snapshot()
+        >>> Hotel.snapshot_is_fresh('overlook_hotel')
+        True
+        >>> copy_of_hotel = Hotel.load_snapshot('overlook_hotel')
+        >>> print(copy_of_hotel.reservations[9998701091820])
+        Booking number: 9998701091820
+        Name: Jack
+        Room reserved: Room 237,Twin,99.99
+        Check-in date: 1975-10-30
+        Check-out date: 1975-12-24
+        >>> copy_of_hotel.rooms[236].is_available(datetime.date(1975, 12, 23), datetime.date(1975, 12, 24))
+        False
+        >>> len(copy_of_hotel.rooms[0].availability)
+        12
+        >>> os.remove('hotels/overlook_hotel/snapshot.bin')
+        """
+        self.load_all_months()
+        months= set()
+        rooms= []
+        room_index= {}
+        reservations= []
         
         for room in self.rooms:
-            availability= room.availability
+            months.update(room.availability)
+            room_index[room.room_num]= len(rooms)
+            rooms.append((room.room_num, room.room_type, room.price))
+        
+        for booking_num, reservation in self.reservations.items():
+            index= room_index[reservation.room_reserved.room_num]
+            reservations.append((booking_num, index, reservation.check_in, reservation.check_out, reservation.name))
+        
+        data= build_snapshot(self.name, sorted(months), rooms, reservations)
+        self.write_atomically('hotels/'+self.folder_name()+'/snapshot.bin', data)
+    
+    @staticmethod
+    def snapshot_is_fresh(filename):
+        folder= 'hotels/'+filename
+        snapshot_file= folder+'/snapshot.bin'
+        
+        if not os.path.exists(snapshot_file):
+            return False
+        
+        snapshot_time= os.stat(snapshot_file).st_mtime_ns
+        
+        for name_split in os.listdir(folder):
             
-            for year, month in availability:
+            if name_split.endswith('.csv') or name_split=='hotel_info.txt':
                 
-                if False in availability[(year, month)]:
-                    month_string= MONTHS[month-1]
-                    self.save_reservations_for_month(month_string, year)
+                if os.stat(folder+'/'+name_split).st_mtime_ns>snapshot_time:
+                    return False
+        
+        return True
     
     @classmethod
-    def load_hotel(cls, filename):
+    def load_snapshot(cls, filename, registry=None):
+        if registry==None:
+            registry= BookingRegistry()
+        
+        with HotelSnapshot('hotels/'+filename+'/snapshot.bin') as snap:
+            room_objects= []
+            rsvs= {}
+            
+            for index in range(snap.room_count):
+                room_num, room_type, price= snap.room(index)
+                room_objects.append(Room(room_type, room_num, price))
+            
+            for year, month in snap.months():
+                
+                for room_obj in room_objects:
+                    room_obj.set_up_room_availability([MONTHS[month-1]], year)
+            
+            for index in range(len(snap)):
+                booking_num, room_index, check_in, check_out, name= snap.reservation(index)
+                rsvs[booking_num]= Reservation(name, room_objects[room_index], check_in, check_out, booking_num, registry)
+            
+            hotel= cls(snap.name, room_objects, rsvs, registry)
+        
+        hotel.info_saved= True
+        
+        return hotel
+    
+    def enable_journal(self, fsync_every=1, max_bytes=1000000, max_age=3600):
+        self.journal= Journal('hotels/'+self.folder_name()+'/journal.jsonl', fsync_every, max_bytes, max_age)
+    
+    def replay_journal(self):
+        """
+        >>> random.seed(987)
+        >>> r1 = Room("Double", 237, 99.99)
+        >>> r1.set_up_room_availability(['Feb', 'Mar'], 2022)
+        >>> h = Hotel("Queen Elizabeth Hotel", [r1], {})
+        >>> h.save_hotel()
+        >>> h.enable_journal()
+        >>> num1 = h.make_reservation("Jack", "Double", datetime.date(2022, 2, 26), datetime.date(2022, 3, 2))
+        >>> num2 = h.make_reservation("Danny", "Double", datetime.date(2022, 3, 5), datetime.date(2022, 3, 6))
+        >>> h.cancel_reservation(num2)
+        
+        >>> h2 = Hotel.load_hotel('queen_elizabeth_hotel')
+        >>> len(h2.reservations)
+        0
+        >>> h2.replay_journal()
+        >>> print(h2.reservations[num1])
+        Booking number: 1953400675629
+        Name: Jack
+        Room reserved: Room 237,Double,99.99
+        Check-in date: 2022-02-26
+        Check-out date: 2022-03-02
+        >>> num2 in h2.reservations, h2.months_to_save()
+        (False, [(2022, 2), (2022, 3)])
+        
+        >>> h2.enable_journal()
+        >>> h2.compact_journal()
+        >>> h2.journal.size(), len(Hotel.load_hotel('queen_elizabeth_hotel').reservations)
+        (0, 1)
+        
+        A crash after the month files are written but before the journal is
+        truncated leaves events the files already hold; folding them keeps a
+        cancelled booking from being made again over a later one.
+        
+        >>> date1, date2 = datetime.date(2022, 3, 10), datetime.date(2022, 3, 12)
+        >>> num3 = h2.make_reservation("Wendy", "Double", date1, date2)
+        >>> h2.cancel_reservation(num3)
+        >>> num4 = h2.make_reservation("Dick", "Double", date1, date2)
+        >>> h2.save_month_files()
+        >>> h2.journal.size() > 0
+        True
+        >>> h3 = Hotel.load_hotel('queen_elizabeth_hotel')
+        >>> h3.replay_journal()
+        >>> sorted(h3.reservations) == sorted([num1, num4])
+        True
+        
+        A hotel without a journal deletes the journal once its own save has
+        written what was replayed, so later cancellations are not undone.
+        
+        >>> h2.journal.close()
+        >>> h3.cancel_reservation(num4)
+        >>> h3.save_hotel()
+        >>> os.path.exists('hotels/queen_elizabeth_hotel/journal.jsonl')
+        False
+        >>> h4 = Hotel.load_hotel('queen_elizabeth_hotel')
+        >>> h4.replay_journal()
+        >>> list(h4.reservations) == [num1]
+        True
+        """
+        previous= self.journal
+        journal= previous
+        
+        if journal==None:
+            journal= Journal('hotels/'+self.folder_name()+'/journal.jsonl')
+        
+        self.journal= None
+        rooms_by_number= {room.room_num: room for room in self.rooms}
+        
+        try:
+            for event in journal.folded():
+                
+                if event['op']=='cancel':
+                    self.cancel_reservation(event['booking'])
+                    continue
+                
+                room= rooms_by_number[event['room']]
+                self.ensure_months(event['check_in'], event['check_out'])
+                
+                if self.find_reservation(event['booking'])==None and room.is_available(event['check_in'], event['check_out']):
+                    self.restore_reservation(event['name'], room, event['check_in'], event['check_out'], event['booking'])
+        
+        finally:
+            self.journal= previous
+    
+    def restore_reservation(self, name, room, check_in, check_out, booking_num):
+        self.ensure_months(check_in, check_out)
+        reservation= Reservation(name, room, check_in, check_out, booking_num, self.registry)
+        self.record_reservation(reservation)
+        self.dirty_months.update(months_between(check_in, check_out))
+        
+        return reservation
+    
+    def compact_journal(self):
+        self.save_hotel()
+    
+    def discard_journal(self):
+        if self.journal!=None:
+            self.journal.truncate()
+        
+        else:
+            Journal('hotels/'+self.folder_name()+'/journal.jsonl').remove()
+    
+    def persist(self):
+        with self.lock:
+            
+            if self.journal==None:
+                self.save_hotel()
+                return
+            
+            self.journal.sync()
+            
+            if self.journal.needs_compaction():
+                self.compact_journal()
+    
+    @classmethod
+    def load_hotel(cls, filename, registry=None, lazy=False, max_months=12, storage=None):
         """
         >>> random.seed(137)
-        >>> Reservation.booking_numbers = []
         >>> hotel = Hotel.load_hotel('overlook_hotel')
         >>> hotel.name
         'Overlook Hotel'
@@ -354,36 +1366,236 @@ class Hotel:
         Check-in date: 1975-10-30
         Check-out date: 1975-12-24
         """
-        dict_room_obj={}
+        if storage!=None:
+            return storage.load(filename, registry, lazy, max_months)
+        
+        months= cls.list_month_files(filename)
+        
+        if lazy:
+            name, room_objects= cls.load_hotel_info_file('hotels/'+filename+'/hotel_info.txt')
+            hotel= cls(name, room_objects, {}, registry)
+            hotel.month_cache= MonthCache(filename, months, max_months)
+            hotel.info_saved= True
+            
+            return hotel
+        
+        month_cells=[]
+        
+        for year, month in months:
+            month_cells.append(cls.iter_reservation_cells(filename, month, year))
+        
+        return cls.build_hotel(filename, months, month_cells, registry)
+    
+    @staticmethod
+    def list_month_files(filename):
+        """
+        >>> months = Hotel.list_month_files('overlook_hotel')
+        >>> len(months), (1975, 'Oct') in months
+        (12, True)
+        """
+        months=[]
+        
+        for name_split in os.listdir('hotels/'+filename):
+            
+            if not name_split.endswith('.csv'):
+                continue
+            
+            year, month= name_split[:-len('.csv')].split("_")
+            months.append((int(year), month))
+        
+        return months
+    
+    @staticmethod
+    def read_reservation_cells(folder, month, year):
+        return list(Hotel.iter_reservation_cells(folder, month, year))
+    
+    @classmethod
+    def build_hotel(cls, filename, months, month_cells, registry=None):
+        """
+        >>> months = [(1975, 'Oct'), (1975, 'Nov')]
+        >>> cells = [Hotel.read_reservation_cells('overlook_hotel', m, y) for y, m in months]
+        >>> hotel = Hotel.build_hotel('overlook_hotel', months, cells)
+        >>> print(hotel.reservations[9998701091820].check_out)
+        1975-12-01
+        """
+        cells_by_room={}
         rsvs={}
-        room_objects= cls.load_hotel_info_file('hotels/'+filename+'/hotel_info.txt')[1]
-        name= cls.load_hotel_info_file('hotels/'+filename+'/hotel_info.txt')[0]
-        list_hotels= os.listdir('hotels/'+filename)
-        
-        for name_split in list_hotels:
-            
-            if 'csv' in name_split:
-                name_split= name_split.split('.')
-                date= name_split[0].split("_")
-                year= int(date[0])
-                month= date[1]
-                dict_tuple= cls.load_reservation_strings_for_month(filename, month, year)
+        
+        if registry==None:
+            registry= BookingRegistry()
+        
+        name, room_objects= cls.load_hotel_info_file('hotels/'+filename+'/hotel_info.txt')
+        
+        for (year, month), cells in zip(months, month_cells):
+            
+            for room_obj in room_objects:
+                room_obj.set_up_room_availability([month], year)
+            
+            for room_num, date, short_string in cells:
+                cells_by_room.setdefault(room_num, []).append((date, short_string))
+        
+        for room_obj in room_objects:
+            cells= cells_by_room.get(room_obj.room_num, [])
+            rsvs.update(Reservation.get_reservations_from_cells(room_obj, cells, registry))
+        
+        hotel= cls(name, room_objects, rsvs, registry)
+        hotel.info_saved= True
+        
+        return hotel
+    
+    def ensure_months(self, date1, date2):
+        """
+        >>> hotel = Hotel.load_hotel('overlook_hotel', lazy=True, max_months=2)
+        >>> date1 = datetime.date(1975, 3, 1)
+        >>> date2 = datetime.date(1975, 3, 5)
+        >>> num = hotel.make_reservation("Wendy", "Twin", date1, date2)
+        >>> hotel.ensure_months(datetime.date(1975, 1, 1), datetime.date(1975, 1, 2))
+        >>> hotel.ensure_months(datetime.date(1975, 5, 1), datetime.date(1975, 5, 2))
+        >>> sorted(hotel.month_cache.loaded)
+        [(1975, 3), (1975, 5)]
+        >>> hotel.reservations[num].room_reserved.is_available(date1, date2)
+        False
+        """
+        self.ensure_month_tuples(months_between(date1, date2))
+    
+    def ensure_month_tuples(self, month_tuples):
+        if self.month_cache==None:
+            return
+        
+        missing= [month_tuple for month_tuple in month_tuples if self.month_cache.needs_loading(month_tuple)]
+        
+        if len(missing)!=0:
+            self.load_months(missing)
+        
+        for month_tuple in month_tuples:
+            self.month_cache.touch(month_tuple)
+        
+        self.evict_months(month_tuples)
+    
+    def load_months(self, month_tuples):
+        cache= self.month_cache
+        pending= list(month_tuples)
+        group= set()
+        cells_by_room= {}
+        
+        while len(pending)!=0:
+            month_tuple= pending.pop()
+            
+            if month_tuple in group or not cache.needs_loading(month_tuple):
+                continue
+            
+            group.add(month_tuple)
+            year, month= month_tuple
+            first, days= CALENDAR.month_range(year, month)
+            
+            for room_num, night, short_string in self.iter_reservation_cells(cache.folder, MONTHS[month-1], year):
+                cells_by_room.setdefault(room_num, []).append((night, short_string))
                 
-                for room_obj in room_objects:
-                    room_obj.set_up_room_availability([month], year)
+                if night==first:
+                    pending.append(previous_month(month_tuple))
                 
-                if dict_room_obj!={}:
-                    for room_num in dict_tuple:
-                        dict_room_obj[room_num]+=dict_tuple[room_num]
+                elif night==first+days-1:
+                    pending.append(next_month(month_tuple))
+        
+        for year, month in sorted(group):
+            
+            for room_obj in self.rooms:
+                room_obj.set_up_room_availability([MONTHS[month-1]], year)
+            
+            cache.add((year, month))
+        
+        for room_obj in self.rooms:
+            
+            if room_obj.room_num not in cells_by_room:
+                continue
+            
+            for short_string in {short_string for night, short_string in cells_by_room[room_obj.room_num]}:
+                booking_num= int(short_string.split("--")[0])
                 
-                else:
-                    dict_room_obj= dict_tuple
+                if self.registry.owner(booking_num) is self:
+                    self.registry.release(booking_num)
+            
+            rsvs= Reservation.get_reservations_from_cells(room_obj, cells_by_room[room_obj.room_num], self.registry)
+            
+            for reservation in rsvs.values():
+                self.record_reservation(reservation)
         
-        for room_obj in room_objects:
-            room_num= room_obj.room_num
-            res_dict_one_room= Reservation.get_reservations_from_row(room_obj, dict_room_obj[room_num])
+        return group
+    
+    def linked_months(self, month_tuple):
+        cache= self.month_cache
+        group= {month_tuple}
+        pending= [month_tuple]
+        
+        while len(pending)!=0:
+            
+            for booking_num in cache.bookings.get(pending.pop(), ()):
+                reservation= self.reservations[booking_num]
+                
+                for other in CALENDAR.months_between(reservation.check_in_ordinal, reservation.check_out_ordinal):
+                    
+                    if other in cache.loaded and other not in group:
+                        group.add(other)
+                        pending.append(other)
+        
+        return group
+    
+    def evict_months(self, keep=()):
+        cache= self.month_cache
+        
+        for month_tuple in list(cache.loaded):
+            
+            if not cache.is_full():
+                return
+            
+            if month_tuple not in cache.loaded:
+                continue
+            
+            group= self.linked_months(month_tuple)
+            
+            if len(group & self.dirty_months)!=0 or len(group & set(keep))!=0:
+                continue
+            
+            self.unload_months(group)
+    
+    def unload_months(self, group):
+        """
+        Evicted bookings still exist on disk, so their numbers stay claimed in
+        the registry with this hotel as owner; only cancelling releases them.
+        
+        >>> registry = BookingRegistry()
+        >>> hotel = Hotel.load_hotel('overlook_hotel', registry, lazy=True, max_months=1)
+        >>> hotel.find_reservation(9998701091820).name
+        'Jack'
+        >>> hotel.ensure_months(datetime.date(1975, 3, 1), datetime.date(1975, 3, 2))
+        >>> 9998701091820 in hotel.reservations, registry.owner(9998701091820) is hotel
+        (False, True)
+        >>> hotel.find_reservation(9998701091820).name
+        'Jack'
+        >>> hotel.cancel_reservation(9998701091820)
+        >>> 9998701091820 in registry
+        False
+        """
+        cache= self.month_cache
+        booking_nums= set()
+        
+        for month_tuple in group:
+            booking_nums.update(cache.bookings.get(month_tuple, ()))
+        
+        for booking_num in booking_nums:
+            reservation= self.forget_reservation(booking_num)
+            reservation.room_reserved.release_range(reservation.check_in, reservation.check_out)
+        
+        for year, month in group:
             
-            for booking_num in res_dict_one_room:
-                rsvs[booking_num]= res_dict_one_room.get(booking_num)
+            for room_obj in self.rooms:
+                room_obj.availability.close_month(year, month)
+            
+            cache.remove((year, month))
+    
+    def load_all_months(self):
+        if self.month_cache==None:
+            return
         
-        return cls(name, room_objects, rsvs)
+        self.load_months(self.month_cache.unloaded())
+        self.month_cache= None
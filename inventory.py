@@ -0,0 +1,89 @@
+import contextlib
+import datetime
+import functools
+from room import Room
+
+
+class RoomInventory:
+    """
+    Per-hotel index from room type to its rooms, plus the number of rooms of
+    each type that are free on every night. The counts are kept up to date by
+    listening to each room's availability, so a request can be turned down
+    in O(nights) before any room is looked at.
+
+    >>> r1 = Room("Queen", 105, 80.0)
+    >>> r2 = Room("Twin", 101, 55.0)
+    >>> r3 = Room("Queen", 107, 80.0)
+    >>> for r in (r1, r2, r3):
+    ...     r.set_up_room_availability(['May'], 2021)
+    >>> inventory = RoomInventory([r1, r2, r3])
+    >>> inventory.room_types()
+    ['Queen', 'Twin']
+    >>> date1 = datetime.date(2021, 5, 3)
+    >>> date2 = datetime.date(2021, 5, 10)
+    >>> inventory.free_rooms('Queen', date1)
+    2
+    >>> r1.reserve_range(date1, date2)
+    >>> r3.availability[(2021, 5)][8] = False
+    >>> inventory.free_rooms('Queen', datetime.date(2021, 5, 8))
+    0
+    >>> print(inventory.find_available_room('Queen', date1, date2))
+    None
+    >>> r1.release_range(date1, date2)
+    >>> inventory.find_available_room('Queen', date1, date2) == r1
+    True
+    """
+    def __init__(self, rooms=()):
+        self.rooms_by_type={}
+        self.free_nights={}
+        self.lock= contextlib.nullcontext()
+
+        for room in rooms:
+            self.add_room(room)
+
+    def add_room(self, room):
+        self.rooms_by_type.setdefault(room.room_type, []).append(room)
+        self.free_nights.setdefault(room.room_type, {})
+
+        for start, end in room.availability.free_ranges():
+            self.update(room.room_type, start, end, 1)
+
+        room.availability.listeners.append(functools.partial(self.update, room.room_type))
+
+    def update(self, room_type, start, end, delta):
+        counts= self.free_nights[room_type]
+
+        with self.lock:
+
+            for night in range(start, end):
+                counts[night]= counts.get(night, 0)+delta
+
+    def room_types(self):
+        return list(self.rooms_by_type)
+
+    def rooms_of_type(self, room_type):
+        return self.rooms_by_type.get(room_type, [])
+
+    def free_rooms(self, room_type, date):
+        return self.free_nights.get(room_type, {}).get(date.toordinal(), 0)
+
+    def has_capacity(self, room_type, date1, date2):
+        counts= self.free_nights.get(room_type, {})
+
+        with self.lock:
+
+            for night in range(date1.toordinal(), date2.toordinal()):
+
+                if counts.get(night, 0)<=0:
+                    return False
+
+        return True
+
+    def find_available_room(self, room_type, date1, date2):
+        if date1>date2:
+            raise AssertionError("The first date is not an earlier date than the second")
+
+        if not self.has_capacity(room_type, date1, date2):
+            return None
+
+        return Room.find_available_room(self.rooms_of_type(room_type), room_type, date1, date2)
@@ -0,0 +1,153 @@
+import datetime
+import json
+import os
+import time
+
+
+class Journal:
+    """
+    Append-only log of the reservations made and cancelled in one hotel since
+    its month files were last written. Each event is one JSON line; events
+    are fsynced in batches of fsync_every.
+
+    >>> import tempfile
+    >>> folder = tempfile.TemporaryDirectory()
+    >>> journal = Journal(os.path.join(folder.name, 'journal.jsonl'), fsync_every=2)
+    >>> journal.append({'op': 'cancel', 'booking': 1953400675629})
+    >>> journal.pending
+    1
+    >>> journal.append({'op': 'cancel', 'booking': 4191471513010})
+    >>> journal.pending
+    0
+    >>> [event['booking'] for event in journal.events()]
+    [1953400675629, 4191471513010]
+    >>> journal.truncate()
+    >>> journal.size(), list(journal.events())
+    (0, [])
+    >>> folder.cleanup()
+    """
+    def __init__(self, filename, fsync_every=1, max_bytes=1000000, max_age=3600):
+        self.filename= filename
+        self.fsync_every= fsync_every
+        self.max_bytes= max_bytes
+        self.max_age= max_age
+        self.pending= 0
+        self.fobj= None
+        self.started= None
+
+    def append(self, event):
+        if self.fobj==None:
+            self.fobj= open(self.filename, 'a', encoding = 'utf-8')
+
+        if self.started==None:
+            self.started= time.time()
+
+        self.fobj.write(json.dumps(event)+'\n')
+        self.fobj.flush()
+        self.pending+= 1
+
+        if self.pending>=self.fsync_every:
+            self.sync()
+
+    def append_make(self, reservation):
+        self.append(Journal.event('make', reservation))
+
+    def append_cancel(self, reservation):
+        self.append(Journal.event('cancel', reservation))
+
+    @staticmethod
+    def event(op, reservation):
+        return {'op': op,
+                'booking': reservation.booking_number,
+                'name': reservation.name,
+                'room': reservation.room_reserved.room_num,
+                'check_in': str(reservation.check_in),
+                'check_out': str(reservation.check_out)}
+
+    def sync(self):
+        if self.fobj!=None and self.pending!=0:
+            self.fobj.flush()
+            os.fsync(self.fobj.fileno())
+
+        self.pending= 0
+
+    def events(self):
+        if not os.path.exists(self.filename):
+            return
+
+        with open(self.filename, 'r', encoding = 'utf-8') as fobj:
+
+            for line in fobj:
+
+                try:
+                    event= json.loads(line)
+
+                except ValueError:
+                    return
+
+                for key in ('check_in', 'check_out'):
+
+                    if key in event:
+                        event[key]= datetime.date.fromisoformat(event[key])
+
+                yield event
+
+    def folded(self):
+        """
+        The last event of every booking, cancellations first. A booking made
+        and cancelled since the month files were written comes back as just
+        its cancellation, so replaying after a crash between writing the
+        month files and truncating the journal never re-makes it onto nights
+        a later booking has taken.
+
+        >>> import tempfile
+        >>> folder = tempfile.TemporaryDirectory()
+        >>> journal = Journal(os.path.join(folder.name, 'journal.jsonl'))
+        >>> for op, booking in [('make', 1), ('cancel', 1), ('make', 2), ('make', 3), ('cancel', 4)]:
+        ...     journal.append({'op': op, 'booking': booking})
+        >>> [(event['op'], event['booking']) for event in journal.folded()]
+        [('cancel', 1), ('cancel', 4), ('make', 2), ('make', 3)]
+        >>> journal.close()
+        >>> folder.cleanup()
+        """
+        last= {}
+
+        for event in self.events():
+            last.pop(event['booking'], None)
+            last[event['booking']]= event
+
+        cancels= [event for event in last.values() if event['op']=='cancel']
+        makes= [event for event in last.values() if event['op']!='cancel']
+
+        return cancels+makes
+
+    def size(self):
+        if not os.path.exists(self.filename):
+            return 0
+
+        return os.path.getsize(self.filename)
+
+    def needs_compaction(self):
+        if self.size()>=self.max_bytes:
+            return True
+
+        return self.started!=None and time.time()-self.started>=self.max_age
+
+    def truncate(self):
+        self.close()
+        open(self.filename, 'w').close()
+        self.started= None
+
+    def remove(self):
+        self.close()
+
+        if os.path.exists(self.filename):
+            os.remove(self.filename)
+
+        self.started= None
+
+    def close(self):
+        if self.fobj!=None:
+            self.sync()
+            self.fobj.close()
+            self.fobj= None
@@ -0,0 +1,72 @@
+import threading
+from hotel import Hotel
+
+
+class HotelLoader:
+    """
+    Loads the hotels of a booking system one after the other in a background
+    thread. Hotel names are read up front from the info files, and each
+    hotel can be waited for on its own, so a caller only waits for the hotel
+    it needs.
+
+    >>> from registry import BookingRegistry
+    >>> loader = HotelLoader(['overlook_hotel', 'the_great_northern_hotel'], BookingRegistry())
+    >>> loader.names
+    ['Overlook Hotel', 'The Great Northern Hotel']
+    >>> loader.start()
+    >>> len(loader.hotel(1).reservations)
+    1
+    >>> [hotel.name for hotel in loader.all()]
+    ['Overlook Hotel', 'The Great Northern Hotel']
+    >>> HotelLoader(['no_such_hotel'], BookingRegistry()).names
+    Traceback (most recent call last):
+    FileNotFoundError: [Errno 2] No such file or directory: 'hotels/no_such_hotel/hotel_info.txt'
+    """
+    def __init__(self, folders, registry, lazy=False, max_months=12, journal=False, fsync_every=1):
+        self.folders= list(folders)
+        self.registry= registry
+        self.lazy= lazy
+        self.max_months= max_months
+        self.journal= journal
+        self.fsync_every= fsync_every
+        self.names= [Hotel.read_hotel_name(folder) for folder in self.folders]
+        self.hotels= [None]*len(self.folders)
+        self.ready= [threading.Event() for folder in self.folders]
+        self.error= None
+        self.thread= threading.Thread(target=self.run, name='hotel-loader', daemon=True)
+
+    def start(self):
+        self.thread.start()
+
+    def run(self):
+        try:
+            for i, folder in enumerate(self.folders):
+                hotel= Hotel.load_hotel(folder, self.registry, lazy=self.lazy, max_months=self.max_months)
+                hotel.replay_journal()
+
+                if self.journal:
+                    hotel.enable_journal(self.fsync_every)
+
+                self.hotels[i]= hotel
+                self.ready[i].set()
+
+        except BaseException as error:
+            self.error= error
+
+        finally:
+            for event in self.ready:
+                event.set()
+
+    def hotel(self, index):
+        self.ready[index].wait()
+
+        if self.hotels[index]==None:
+            raise self.error
+
+        return self.hotels[index]
+
+    def all(self):
+        return [self.hotel(i) for i in range(len(self.folders))]
+
+    def loaded(self):
+        return [hotel for hotel in self.hotels if hotel!=None]
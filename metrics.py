@@ -0,0 +1,267 @@
+import bisect
+import functools
+import os
+import threading
+import time
+from hotel import Hotel
+from room import Room
+
+BUCKETS= (0.00001, 0.0001, 0.001, 0.01, 0.1, 1.0, 10.0)
+
+HOT_PATHS= [(Hotel, 'load_hotel'),
+            (Hotel, 'build_hotel'),
+            (Hotel, 'load_months'),
+            (Room, 'is_available'),
+            (Hotel, 'find_available_room'),
+            (Hotel, 'make_reservation'),
+            (Hotel, 'cancel_reservation'),
+            (Hotel, 'save_hotel')]
+
+MONTH_READERS= [(Hotel, 'iter_reservation_cells')]
+
+
+class Metrics:
+    """
+    Call counts, cumulative time and latency histograms per method, and bytes
+    read and written per file. Nothing is recorded until enable() wraps the
+    hot paths; disable() puts the original methods back, so the disabled
+    cost is nil. Server and loader threads record under one lock.
+
+    >>> import datetime
+    >>> metrics = Metrics()
+    >>> metrics.enable()
+    >>> hotel = Hotel.load_hotel('overlook_hotel')
+    >>> num = hotel.make_reservation('Wendy', 'Queen', datetime.date(1975, 12, 20), datetime.date(1975, 12, 22))
+    >>> hotel.cancel_reservation(num)
+    >>> metrics.disable()
+    >>> hotel.cancel_reservation(num)
+    >>> stats = metrics.snapshot()
+    >>> stats['calls']['Hotel.load_hotel']['count'], stats['calls']['Hotel.cancel_reservation']['count']
+    (1, 1)
+    >>> stats['calls']['Room.is_available']['count'] >= 1
+    True
+    >>> stats['bytes_read']['overlook_hotel/1975_Dec.csv'] == os.path.getsize('hotels/overlook_hotel/1975_Dec.csv')
+    True
+    >>> print(metrics.prometheus().splitlines()[0])
+    # TYPE hotel_calls_total counter
+    >>> Hotel.make_reservation is Metrics.original(Hotel, 'make_reservation')
+    True
+
+    Months loaded on demand are timed by Hotel.load_months:
+
+    >>> metrics.reset()
+    >>> metrics.enable()
+    >>> lazy = Hotel.load_hotel('overlook_hotel', lazy=True, max_months=2)
+    >>> print(lazy.find_reservation(9998701091820).name)
+    Jack
+    >>> metrics.disable()
+    >>> metrics.snapshot()['calls']['Hotel.load_months']['count'] >= 1
+    True
+
+    >>> import threading
+    >>> counting = Metrics()
+    >>> def record():
+    ...     for _ in range(2000):
+    ...         counting.observe('Hotel.find_available_room', 0.0)
+    >>> threads = [threading.Thread(target=record) for _ in range(8)]
+    >>> for thread in threads:
+    ...     thread.start()
+    >>> for thread in threads:
+    ...     thread.join()
+    >>> counting.snapshot()['calls']['Hotel.find_available_room']['count']
+    16000
+    """
+    def __init__(self):
+        self.calls= {}
+        self.bytes_read= {}
+        self.bytes_written= {}
+        self.originals= {}
+        self.lock= threading.Lock()
+
+    def reset(self):
+        with self.lock:
+            self.calls= {}
+            self.bytes_read= {}
+            self.bytes_written= {}
+
+    def observe(self, name, seconds):
+        bucket= bisect.bisect_left(BUCKETS, seconds)
+
+        with self.lock:
+
+            if name not in self.calls:
+                self.calls[name]= [0, 0.0, [0]*(len(BUCKETS)+1)]
+
+            stats= self.calls[name]
+            stats[0]+= 1
+            stats[1]+= seconds
+            stats[2][bucket]+= 1
+
+    @staticmethod
+    def file_key(filename):
+        """
+        >>> Metrics.file_key('hotels/overlook_hotel/1975_Dec.csv')
+        'overlook_hotel/1975_Dec.csv'
+        """
+        folder, name= os.path.split(filename)
+
+        return os.path.basename(folder)+'/'+name
+
+    def count_read(self, filename):
+        if os.path.exists(filename):
+            key= Metrics.file_key(filename)
+            size= os.path.getsize(filename)
+
+            with self.lock:
+                self.bytes_read[key]= self.bytes_read.get(key, 0)+size
+
+    def count_written(self, filename, data):
+        size= len(data) if isinstance(data, bytes) else len(data.encode('utf-8'))
+        key= Metrics.file_key(filename)
+
+        with self.lock:
+            self.bytes_written[key]= self.bytes_written.get(key, 0)+size
+
+    @staticmethod
+    def original(cls, name):
+        attribute= cls.__dict__[name]
+
+        if isinstance(attribute, (staticmethod, classmethod)):
+            return getattr(cls, name)
+
+        return attribute
+
+    def patch(self, cls, name, wrap):
+        attribute= cls.__dict__[name]
+        self.originals.setdefault((cls, name), attribute)
+
+        if isinstance(attribute, staticmethod):
+            setattr(cls, name, staticmethod(wrap(attribute.__func__)))
+
+        elif isinstance(attribute, classmethod):
+            setattr(cls, name, classmethod(wrap(attribute.__func__)))
+
+        else:
+            setattr(cls, name, wrap(attribute))
+
+    def timed(self, name):
+        def wrap(func):
+
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                start= time.perf_counter()
+
+                try:
+                    return func(*args, **kwargs)
+
+                finally:
+                    self.observe(name, time.perf_counter()-start)
+
+            return wrapper
+
+        return wrap
+
+    def reading(self, func):
+        @functools.wraps(func)
+        def wrapper(folder, month, year):
+            self.count_read('hotels/'+folder+'/'+str(year)+'_'+month+'.csv')
+            return func(folder, month, year)
+
+        return wrapper
+
+    def writing(self, func):
+        @functools.wraps(func)
+        def wrapper(filename, text):
+            result= func(filename, text)
+            self.count_written(filename, text)
+            return result
+
+        return wrapper
+
+    def enable(self):
+        if len(self.originals)!=0:
+            return
+
+        for cls, name in MONTH_READERS:
+            self.patch(cls, name, self.reading)
+
+        self.patch(Hotel, 'write_atomically', self.writing)
+
+        for cls, name in HOT_PATHS:
+            self.patch(cls, name, self.timed(cls.__name__+'.'+name))
+
+    def disable(self):
+        for (cls, name), attribute in self.originals.items():
+            setattr(cls, name, attribute)
+
+        self.originals= {}
+
+    def copy(self):
+        with self.lock:
+            calls= {name: (count, seconds, list(buckets)) for name, (count, seconds, buckets) in self.calls.items()}
+
+            return calls, dict(self.bytes_read), dict(self.bytes_written)
+
+    def snapshot(self):
+        calls= {}
+        counts, bytes_read, bytes_written= self.copy()
+
+        for name, (count, seconds, buckets) in counts.items():
+            calls[name]= {'count': count,
+                          'seconds': seconds,
+                          'buckets': dict(zip([str(bound) for bound in BUCKETS]+['+Inf'], buckets))}
+
+        return {'calls': calls, 'bytes_read': bytes_read, 'bytes_written': bytes_written}
+
+    def prometheus(self):
+        """
+        >>> metrics = Metrics()
+        >>> metrics.observe('Hotel.save_hotel', 0.005)
+        >>> metrics.count_written('hotels/overlook_hotel/1975_Dec.csv', 'abc')
+        >>> print(metrics.prometheus())
+        # TYPE hotel_calls_total counter
+        hotel_calls_total{method="Hotel.save_hotel"} 1
+        # TYPE hotel_call_seconds histogram
+        hotel_call_seconds_bucket{method="Hotel.save_hotel",le="1e-05"} 0
+        hotel_call_seconds_bucket{method="Hotel.save_hotel",le="0.0001"} 0
+        hotel_call_seconds_bucket{method="Hotel.save_hotel",le="0.001"} 0
+        hotel_call_seconds_bucket{method="Hotel.save_hotel",le="0.01"} 1
+        hotel_call_seconds_bucket{method="Hotel.save_hotel",le="0.1"} 1
+        hotel_call_seconds_bucket{method="Hotel.save_hotel",le="1.0"} 1
+        hotel_call_seconds_bucket{method="Hotel.save_hotel",le="10.0"} 1
+        hotel_call_seconds_bucket{method="Hotel.save_hotel",le="+Inf"} 1
+        hotel_call_seconds_sum{method="Hotel.save_hotel"} 0.005
+        hotel_call_seconds_count{method="Hotel.save_hotel"} 1
+        # TYPE hotel_file_bytes_read_total counter
+        # TYPE hotel_file_bytes_written_total counter
+        hotel_file_bytes_written_total{file="overlook_hotel/1975_Dec.csv"} 3
+        """
+        calls, bytes_read, bytes_written= self.copy()
+        lines= ['# TYPE hotel_calls_total counter']
+
+        for name in sorted(calls):
+            lines.append('hotel_calls_total{method="'+name+'"} '+str(calls[name][0]))
+
+        lines.append('# TYPE hotel_call_seconds histogram')
+
+        for name in sorted(calls):
+            count, seconds, buckets= calls[name]
+            total= 0
+
+            for bound, bucket in zip([str(bound) for bound in BUCKETS]+['+Inf'], buckets):
+                total+= bucket
+                lines.append('hotel_call_seconds_bucket{method="'+name+'",le="'+bound+'"} '+str(total))
+
+            lines.append('hotel_call_seconds_sum{method="'+name+'"} '+repr(seconds))
+            lines.append('hotel_call_seconds_count{method="'+name+'"} '+str(count))
+
+        for kind, counts in (('read', bytes_read), ('written', bytes_written)):
+            lines.append('# TYPE hotel_file_bytes_'+kind+'_total counter')
+
+            for key in sorted(counts):
+                lines.append('hotel_file_bytes_'+kind+'_total{file="'+key+'"} '+str(counts[key]))
+
+        return '\n'.join(lines)
+
+
+METRICS= Metrics()
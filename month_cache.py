@@ -0,0 +1,77 @@
+import collections
+import datetime
+from calendar_table import CALENDAR, MONTHS
+
+
+def months_between(date1, date2):
+    """
+    >>> months_between(datetime.date(2021, 12, 20), datetime.date(2022, 1, 8))
+    [(2021, 12), (2022, 1)]
+    >>> months_between(datetime.date(2021, 5, 3), datetime.date(2021, 6, 1))
+    [(2021, 5)]
+    """
+    return CALENDAR.months_between(date1.toordinal(), date2.toordinal())
+
+
+def next_month(month_tuple):
+    year, month= month_tuple
+
+    if month==12:
+        return year+1, 1
+
+    return year, month+1
+
+
+def previous_month(month_tuple):
+    year, month= month_tuple
+
+    if month==1:
+        return year-1, 12
+
+    return year, month-1
+
+
+class MonthCache:
+    """
+    Bookkeeping for a hotel whose month files are loaded on demand: which
+    months exist on disk, which are loaded (least recently used first), and
+    which booking numbers touch each loaded month.
+
+    >>> cache = MonthCache('overlook_hotel', [(1975, 'Oct'), (1975, 'Nov'), (1975, 'Dec')], 2)
+    >>> sorted(cache.unloaded())
+    [(1975, 10), (1975, 11), (1975, 12)]
+    >>> cache.add((1975, 11))
+    >>> cache.add((1975, 10))
+    >>> cache.touch((1975, 11))
+    >>> list(cache.loaded)
+    [(1975, 10), (1975, 11)]
+    """
+    def __init__(self, folder, months, capacity=12):
+        self.folder= folder
+        self.on_disk= set()
+        self.loaded= collections.OrderedDict()
+        self.bookings= {}
+        self.capacity= capacity
+
+        for year, month in months:
+            self.on_disk.add((year, MONTHS.index(month)+1))
+
+    def unloaded(self):
+        return [key for key in sorted(self.on_disk) if key not in self.loaded]
+
+    def needs_loading(self, month_tuple):
+        return month_tuple in self.on_disk and month_tuple not in self.loaded
+
+    def add(self, month_tuple):
+        self.loaded[month_tuple]= True
+
+    def remove(self, month_tuple):
+        del self.loaded[month_tuple]
+        self.bookings.pop(month_tuple, None)
+
+    def touch(self, month_tuple):
+        if month_tuple in self.loaded:
+            self.loaded.move_to_end(month_tuple)
+
+    def is_full(self):
+        return len(self.loaded)>self.capacity
@@ -0,0 +1,116 @@
+import datetime
+import functools
+import numpy as np
+from room import Room
+
+
+class OccupancyMatrix:
+    """
+    Rooms x nights matrix of free nights for one hotel, over the nights that
+    are set up in any of its rooms. Room availability listeners keep it up to
+    date; when a room opens nights outside the matrix it is marked stale and
+    the hotel rebuilds it on the next search.
+
+    >>> r1 = Room("Queen", 105, 80.0)
+    >>> r2 = Room("Twin", 101, 55.0)
+    >>> r3 = Room("Queen", 107, 75.0)
+    >>> for r in (r1, r2, r3):
+    ...     r.set_up_room_availability(['May'], 2021)
+    >>> matrix = OccupancyMatrix([r1, r2, r3])
+    >>> matrix.free.shape
+    (3, 31)
+    >>> date1 = datetime.date(2021, 5, 3)
+    >>> date2 = datetime.date(2021, 5, 10)
+    >>> r3.reserve_range(datetime.date(2021, 5, 9), date2)
+    >>> matrix.free_rooms(date1, date2).tolist()
+    [True, True, False]
+    >>> matrix.summary(date1, date2)
+    {'Queen': (1, 80.0), 'Twin': (1, 55.0)}
+    >>> matrix.summary(date1, datetime.date(2021, 6, 2), ['Twin'])
+    {'Twin': (0, None)}
+    >>> r1.set_up_room_availability(['Jun'], 2021)
+    >>> matrix.stale
+    True
+    """
+    def __init__(self, rooms):
+        self.rooms= rooms
+        self.type_names= []
+        codes= []
+        first= None
+        last= None
+
+        for room in rooms:
+
+            if room.room_type not in self.type_names:
+                self.type_names.append(room.room_type)
+
+            codes.append(self.type_names.index(room.room_type))
+
+            for start, end in room.availability.open:
+
+                if first==None or start<first:
+                    first= start
+
+                if last==None or end>last:
+                    last= end
+
+        if first==None:
+            first= last= 0
+
+        self.first= first
+        self.last= last
+        self.type_codes= np.array(codes, dtype=np.int16)
+        self.prices= np.array([room.price for room in rooms], dtype=np.float64)
+        self.free= np.zeros((len(rooms), last-first), dtype=bool)
+        self.listeners= []
+        self.stale= False
+
+        for row, room in enumerate(rooms):
+
+            for start, end in room.availability.free_ranges():
+                self.free[row, start-first:end-first]= True
+
+            listener= functools.partial(self.update, row)
+            room.availability.listeners.append(listener)
+            self.listeners.append(listener)
+
+    def update(self, row, start, end, delta):
+        if start<self.first or end>self.last:
+            self.stale= True
+            return
+
+        self.free[row, start-self.first:end-self.first]= delta>0
+
+    def detach(self):
+        for room, listener in zip(self.rooms, self.listeners):
+            room.availability.listeners.remove(listener)
+
+        self.listeners= []
+
+    def free_rooms(self, check_in, check_out):
+        start, end= check_in.toordinal(), check_out.toordinal()
+
+        if start<self.first or end>self.last:
+            return np.zeros(len(self.rooms), dtype=bool)
+
+        return self.free[:, start-self.first:end-self.first].all(axis=1)
+
+    def summary(self, check_in, check_out, room_types=None):
+        free_rows= self.free_rooms(check_in, check_out)
+        result= {}
+
+        for code, room_type in enumerate(self.type_names):
+
+            if room_types!=None and room_type not in room_types:
+                continue
+
+            mask= free_rows & (self.type_codes==code)
+            count= int(mask.sum())
+
+            if count==0:
+                result[room_type]= (0, None)
+
+            else:
+                result[room_type]= (count, float(self.prices[mask].min()))
+
+        return result
@@ -0,0 +1,100 @@
+import contextlib
+import random
+import threading
+
+
+class BookingRegistry:
+    """
+    The booking numbers in use by one booking system, each mapped to the
+    hotel that holds it, so that checking, claiming, releasing and finding
+    the owner of a number are O(1).
+
+    >>> random.seed(987)
+    >>> registry = BookingRegistry()
+    >>> registry.new_number()
+    1953400675629
+    >>> registry.claim(1953400675629)
+    Traceback (most recent call last):
+    AssertionError: The booking number is currently unavailable
+    >>> numbers = registry.new_numbers(3)
+    >>> len(numbers), len(set(numbers)), len(registry)
+    (3, 3, 4)
+    >>> registry.release(1953400675629)
+    >>> 1953400675629 in registry
+    False
+    >>> registry.claim(4191471513010, 'Overlook Hotel')
+    >>> registry.owner(4191471513010), registry.owner(1953400675629)
+    ('Overlook Hotel', None)
+
+    New numbers are drawn from rng when one is given, otherwise from the
+    random module, so a seeded rng gives the same numbers on every run.
+
+    >>> BookingRegistry(rng=random.Random(5)).new_numbers(2) == BookingRegistry(rng=random.Random(5)).new_numbers(2)
+    True
+    """
+    LOWEST= 1000000000000
+    HIGHEST= 9999999999999
+
+    def __init__(self, numbers=(), rng=None):
+        self.numbers= dict.fromkeys(numbers)
+        self.rng= rng
+        self.lock= contextlib.nullcontext()
+
+    def __getstate__(self):
+        state= self.__dict__.copy()
+        state['lock']= contextlib.nullcontext()
+        return state
+
+    def enable_locking(self):
+        if isinstance(self.lock, contextlib.nullcontext):
+            self.lock= threading.Lock()
+
+    def __contains__(self, number):
+        return number in self.numbers
+
+    def __iter__(self):
+        return iter(self.numbers)
+
+    def __len__(self):
+        return len(self.numbers)
+
+    def claim(self, number, owner=None):
+        with self.lock:
+
+            if number in self.numbers:
+                raise AssertionError("The booking number is currently unavailable")
+
+            self.numbers[number]= owner
+
+    def assign(self, number, owner):
+        with self.lock:
+            self.numbers[number]= owner
+
+    def owner(self, number):
+        return self.numbers.get(number)
+
+    def new_number(self, owner=None):
+        rng= random if self.rng==None else self.rng
+
+        with self.lock:
+            number= rng.randint(BookingRegistry.LOWEST, BookingRegistry.HIGHEST)
+
+            while number in self.numbers:
+                number= rng.randint(BookingRegistry.LOWEST, BookingRegistry.HIGHEST)
+
+            self.numbers[number]= owner
+
+        return number
+
+    def new_numbers(self, count, owner=None):
+        return [self.new_number(owner) for _ in range(count)]
+
+    def release(self, number):
+        with self.lock:
+            self.numbers.pop(number, None)
+
+    def release_many(self, numbers):
+        with self.lock:
+
+            for number in numbers:
+                self.numbers.pop(number, None)
@@ -0,0 +1,235 @@
+import argparse
+import datetime
+import json
+import sys
+import time
+from booking import Booking
+
+
+class ReplayDriver:
+    """
+    Applies make/cancel/lookup operations to a booking system without going
+    through the menu prompts. Each operation is a dict (one JSON line) and
+    gives back a result dict; touched hotels are saved every save_every
+    operations, or only by save() when save_every is 0.
+
+    >>> import random
+    >>> random.seed(987)
+    >>> driver = ReplayDriver(Booking.load_system())
+    >>> made = driver.apply({'op': 'make', 'hotel': 'Overlook Hotel', 'name': 'Wendy',
+    ...                      'room_type': 'Queen', 'check_in': '1975-12-20', 'check_out': '1975-12-22'})
+    >>> made['ok'], made['room'], made['total']
+    (True, 3, 252.2)
+    >>> driver.apply({'op': 'lookup', 'hotel': 'Overlook Hotel', 'name': 'wendy'})['bookings'] == [made['booking']]
+    True
+    >>> driver.apply({'op': 'lookup', 'hotel': 'Overlook Hotel', 'room': 237, 'check_in': '1975-10-30'})['bookings']
+    [9998701091820]
+    >>> driver.apply({'op': 'cancel', 'booking': made['booking']})['ok']
+    True
+    >>> driver.apply({'op': 'cancel', 'booking': made['booking']})
+    {'op': 'cancel', 'ok': False, 'error': 'No reservation was found with that booking number'}
+    >>> driver.apply({'op': 'fly'})
+    {'op': 'fly', 'ok': False, 'error': 'Unknown operation: fly'}
+    >>> report = driver.report()
+    >>> report['ops'], sorted(report['latency_ms'])
+    (6, ['cancel', 'fly', 'lookup', 'make'])
+    """
+    PERCENTILES= (50, 90, 99)
+
+    def __init__(self, booking, save_every=0):
+        self.booking= booking
+        self.save_every= save_every
+        self.hotels= {hotel_obj.name: hotel_obj for hotel_obj in booking.hotels}
+        self.latencies= {}
+        self.ops= 0
+        self.elapsed= 0.0
+        self.save_seconds= 0.0
+        self.touched= set()
+
+    def run(self, lines, out):
+        for line in lines:
+
+            if line.strip()=='':
+                continue
+
+            try:
+                request= json.loads(line)
+
+            except ValueError:
+                request= {'op': None, 'error': 'Not a JSON line'}
+
+            out.write(json.dumps(self.apply(request))+'\n')
+
+    def apply(self, request):
+        op= request.get('op')
+        start= time.perf_counter()
+
+        try:
+            if 'error' in request:
+                raise AssertionError(request['error'])
+
+            if op=='make':
+                result= self.make(request)
+
+            elif op=='cancel':
+                result= self.cancel(request)
+
+            elif op=='lookup':
+                result= self.lookup(request)
+
+            else:
+                raise AssertionError("Unknown operation: "+str(op))
+
+            result= dict({'op': op, 'ok': True}, **result)
+
+        except (AssertionError, KeyError, ValueError, TypeError) as error:
+            message= error.args[0] if len(error.args)!=0 else type(error).__name__
+            result= {'op': op, 'ok': False, 'error': str(message)}
+
+        seconds= time.perf_counter()-start
+        self.latencies.setdefault(str(op), []).append(seconds)
+        self.elapsed+= seconds
+        self.ops+= 1
+
+        if self.save_every!=0 and self.ops%self.save_every==0:
+            self.save()
+
+        return result
+
+    def hotel(self, request):
+        if request.get('hotel') not in self.hotels:
+            raise AssertionError("Unknown hotel: "+str(request.get('hotel')))
+
+        return self.hotels[request['hotel']]
+
+    @staticmethod
+    def date(request, key):
+        return datetime.date.fromisoformat(request[key])
+
+    def make(self, request):
+        hotel_obj= self.hotel(request)
+        check_in= ReplayDriver.date(request, 'check_in')
+        check_out= ReplayDriver.date(request, 'check_out')
+        booking_num= hotel_obj.make_reservation(request['name'], request['room_type'], check_in, check_out)
+        self.touched.add(hotel_obj)
+        reservation= hotel_obj.reservations[booking_num]
+
+        return {'booking': booking_num,
+                'room': reservation.room_reserved.room_num,
+                'total': round(hotel_obj.get_receipt([booking_num]), 2)}
+
+    def cancel(self, request):
+        booking_num= int(request['booking'])
+        hotel_obj, reservation= self.booking.find_reservation(booking_num)
+
+        if reservation==None:
+            raise AssertionError("No reservation was found with that booking number")
+
+        hotel_obj.cancel_reservation(booking_num)
+        self.touched.add(hotel_obj)
+
+        return {'booking': booking_num, 'hotel': hotel_obj.name}
+
+    def lookup(self, request):
+        if 'booking' in request:
+            hotel_obj, reservation= self.booking.find_reservation(int(request['booking']))
+            found= [] if reservation==None else [(hotel_obj, reservation)]
+
+        elif 'room' in request:
+            hotel_obj= self.hotel(request)
+            reservation= hotel_obj.find_by_stay(int(request['room']), ReplayDriver.date(request, 'check_in'))
+            found= [] if reservation==None else [(hotel_obj, reservation)]
+
+        else:
+            hotel_obj= self.hotel(request)
+            hotel_obj.load_all_months()
+            found= [(hotel_obj, reservation) for reservation in hotel_obj.find_by_guest(request['name'])]
+
+        found.sort(key=lambda pair: pair[1].booking_number)
+
+        return {'bookings': [reservation.booking_number for hotel_obj, reservation in found],
+                'reservations': [ReplayDriver.describe(hotel_obj, reservation) for hotel_obj, reservation in found]}
+
+    @staticmethod
+    def describe(hotel_obj, reservation):
+        return {'hotel': hotel_obj.name,
+                'booking': reservation.booking_number,
+                'name': reservation.name,
+                'room': reservation.room_reserved.room_num,
+                'check_in': str(reservation.check_in),
+                'check_out': str(reservation.check_out),
+                'total': round(hotel_obj.get_receipt([reservation.booking_number]), 2)}
+
+    def save(self):
+        start= time.perf_counter()
+
+        for hotel_obj in self.touched:
+            hotel_obj.persist()
+
+        self.touched= set()
+        self.save_seconds+= time.perf_counter()-start
+
+    @staticmethod
+    def percentile(sorted_values, percent):
+        """
+        >>> ReplayDriver.percentile([1, 2, 3, 4], 50), ReplayDriver.percentile([1, 2, 3, 4], 99)
+        (2, 4)
+        """
+        index= max(0, -(-len(sorted_values)*percent//100)-1)
+
+        return sorted_values[index]
+
+    def report(self):
+        latency= {}
+
+        for op, values in self.latencies.items():
+            values= sorted(values)
+            latency[op]= {'count': len(values)}
+
+            for percent in ReplayDriver.PERCENTILES:
+                latency[op]['p'+str(percent)]= round(ReplayDriver.percentile(values, percent)*1000, 3)
+
+            latency[op]['max']= round(values[-1]*1000, 3)
+
+        seconds= self.elapsed+self.save_seconds
+        ops_per_sec= self.ops/seconds if seconds>0 else 0.0
+
+        return {'ops': self.ops,
+                'seconds': round(seconds, 6),
+                'save_seconds': round(self.save_seconds, 6),
+                'ops_per_sec': round(ops_per_sec, 1),
+                'latency_ms': latency}
+
+
+def main(argv=None):
+    parser= argparse.ArgumentParser(description="Replay JSON-lines make/cancel/lookup operations against the booking system.")
+    parser.add_argument('requests', help="JSON-lines file of operations, or - for stdin")
+    parser.add_argument('-o', '--output', default='-', help="where to write the JSON-lines results (default: stdout)")
+    parser.add_argument('--save-every', type=int, default=0, help="save touched hotels every N operations (default: only at the end)")
+    parser.add_argument('--lazy', action='store_true', help="load month files on demand")
+    parser.add_argument('--max-months', type=int, default=12)
+    parser.add_argument('--journal', action='store_true', help="journal changes instead of rewriting month files")
+    parser.add_argument('--workers', type=int, default=None)
+    args= parser.parse_args(argv)
+
+    booking= Booking.load_system(workers=args.workers, lazy=args.lazy, max_months=args.max_months, journal=args.journal)
+    driver= ReplayDriver(booking, args.save_every)
+    lines= sys.stdin if args.requests=='-' else open(args.requests, 'r', encoding = 'utf-8')
+    out= sys.stdout if args.output=='-' else open(args.output, 'w', encoding = 'utf-8')
+
+    try:
+        driver.run(lines, out)
+        driver.save()
+
+    finally:
+        if lines is not sys.stdin:
+            lines.close()
+
+        if out is not sys.stdout:
+            out.close()
+
+    print(json.dumps(driver.report()), file=sys.stderr)
+
+
+if __name__=='__main__':
+    main()
@@ -0,0 +1,167 @@
+import datetime
+import numpy as np
+from calendar_table import CALENDAR
+from month_cache import next_month
+
+
+class ReservationColumns:
+    """
+    Reservations of a hotel laid out as NumPy columns: room index, room type
+    code, nightly price, check-in ordinal and check-out ordinal.
+
+    >>> from hotel import Hotel
+    >>> hotel = Hotel.load_hotel('overlook_hotel')
+    >>> columns = ReservationColumns(hotel.rooms, list(hotel.reservations.values()))
+    >>> columns.room_index.tolist(), columns.nights().tolist()
+    ([236], [55])
+    >>> round(columns.total_revenue(), 2)
+    5499.45
+    """
+    def __init__(self, rooms, reservations):
+        room_index= {}
+        self.type_names= []
+        room_types= []
+
+        for i, room in enumerate(rooms):
+            room_index[room.room_num]= i
+
+            if room.room_type not in self.type_names:
+                self.type_names.append(room.room_type)
+
+            room_types.append(self.type_names.index(room.room_type))
+
+        count= len(reservations)
+        self.room_types= np.array(room_types, dtype=np.int16)
+        self.room_index= np.fromiter((room_index[rsv.room_reserved.room_num] for rsv in reservations), dtype=np.int64, count=count)
+        self.type_code= self.room_types[self.room_index]
+        self.price= np.fromiter((rsv.room_reserved.price for rsv in reservations), dtype=np.float64, count=count)
+        self.check_in= np.fromiter((rsv.check_in_ordinal for rsv in reservations), dtype=np.int64, count=count)
+        self.check_out= np.fromiter((rsv.check_out_ordinal for rsv in reservations), dtype=np.int64, count=count)
+
+    def __len__(self):
+        return len(self.price)
+
+    def nights(self):
+        return self.check_out-self.check_in
+
+    def revenue(self):
+        return self.nights()*self.price
+
+    def total_revenue(self):
+        return float(self.revenue().sum())
+
+
+class HotelReport:
+    """
+    Occupancy and revenue figures for one hotel, computed over its columns
+    with difference arrays instead of walking reservations night by night.
+    Revenue is counted on the nights it is earned. A lazily loaded hotel is
+    fully loaded first.
+
+    >>> from hotel import Hotel
+    >>> report = HotelReport(Hotel.load_hotel('overlook_hotel'))
+    >>> report.first == datetime.date(1975, 1, 1).toordinal(), report.last-report.first
+    (True, 365)
+    >>> occupied, revenue = report.nightly()
+    >>> int(occupied.sum()), int(occupied[datetime.date(1975, 10, 30).toordinal()-report.first])
+    (55, 1)
+    >>> {key: round(value, 2) for key, value in report.revenue_per_month().items() if value}
+    {(1975, 10): 199.98, (1975, 11): 2999.7, (1975, 12): 2299.77}
+    >>> {key: round(value, 2) for key, value in report.revenue_per_room_type().items()}
+    {'Double': 0.0, 'Queen': 0.0, 'King': 0.0, 'Twin': 5499.45}
+    >>> round(report.occupancy_rate(), 6), round(report.revpar(), 4)
+    (0.000301, 0.0301)
+    """
+    def __init__(self, hotel):
+        hotel.load_all_months()
+        self.hotel= hotel
+        self.columns= ReservationColumns(hotel.rooms, list(hotel.reservations.values()))
+        first= None
+        last= None
+
+        for room in hotel.rooms:
+
+            for start, end in room.availability.open:
+
+                if first==None or start<first:
+                    first= start
+
+                if last==None or end>last:
+                    last= end
+
+        if first==None:
+            first= last= 0
+
+        self.first= first
+        self.last= last
+
+    def nightly(self):
+        columns= self.columns
+        size= self.last-self.first
+        start= np.clip(columns.check_in-self.first, 0, size)
+        end= np.clip(columns.check_out-self.first, 0, size)
+        occupied= np.zeros(size+1, dtype=np.int64)
+        revenue= np.zeros(size+1, dtype=np.float64)
+        np.add.at(occupied, start, 1)
+        np.add.at(occupied, end, -1)
+        np.add.at(revenue, start, columns.price)
+        np.add.at(revenue, end, -columns.price)
+
+        return np.cumsum(occupied)[:size], np.cumsum(revenue)[:size]
+
+    def available_per_night(self):
+        size= self.last-self.first
+        available= np.zeros(size+1, dtype=np.int64)
+
+        for room in self.hotel.rooms:
+
+            for start, end in room.availability.open:
+                available[start-self.first]+= 1
+                available[end-self.first]-= 1
+
+        return np.cumsum(available)[:size]
+
+    def month_starts(self):
+        months= []
+        month_tuple= CALENDAR.month_of(self.first)
+        first= CALENDAR.month_start(*month_tuple)
+
+        while first<self.last:
+            months.append((month_tuple, max(first-self.first, 0)))
+            month_tuple= next_month(month_tuple)
+            first= CALENDAR.month_start(*month_tuple)
+
+        return months
+
+    def revenue_per_month(self):
+        revenue= self.nightly()[1]
+        months= self.month_starts()
+
+        if len(months)==0:
+            return {}
+
+        totals= np.add.reduceat(revenue, [offset for key, offset in months])
+
+        return {key: float(total) for (key, offset), total in zip(months, totals)}
+
+    def revenue_per_room_type(self):
+        columns= self.columns
+        totals= np.bincount(columns.type_code, weights=columns.revenue(), minlength=len(columns.type_names))
+
+        return {room_type: float(total) for room_type, total in zip(columns.type_names, totals)}
+
+    def occupancy_rate(self):
+        available= self.available_per_night().sum()
+
+        if available==0:
+            return 0.0
+
+        return float(self.nightly()[0].sum()/available)
+
+    def revpar(self):
+        available= self.available_per_night().sum()
+
+        if available==0:
+            return 0.0
+
+        return float(self.nightly()[1].sum()/available)
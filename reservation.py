@@ -1,16 +1,19 @@
 
 import datetime
 import random
+import sys
 from room import Room, MONTHS, DAYS_PER_MONTH
-import doctest
+from calendar_table import CALENDAR
+from registry import BookingRegistry
 
 class Reservation:
-    booking_numbers=[]
+    __slots__= ('name', 'room_reserved', 'check_in_ordinal', 'check_out_ordinal', 'booking_number')
+    booking_numbers=BookingRegistry()
     
-    def __init__(self, name, room_reserved, date1, date2, booking_number=None):
+    def __init__(self, name, room_reserved, date1, date2, booking_number=None, registry=None):
         """
         >>> random.seed(987)
-        >>> Reservation.booking_numbers = []
+        >>> Reservation.booking_numbers = BookingRegistry()
         >>> r1 = Room("Queen", 105, 80.0)
         >>> r1.set_up_room_availability(['May'], 2021)
         >>> date1 = datetime.date(2021, 5, 3)
@@ -26,23 +29,23 @@ class Reservation:
         False
         >>> r1.availability[(2021, 5)][10]
         True
+        >>> my_reservation.check_in_ordinal == date1.toordinal(), hasattr(my_reservation, '__dict__')
+        (True, False)
         """
         if not room_reserved.is_available(date1, date2):
             raise AssertionError("The room is not available at the specified dates")
         
-        self.name= name
+        self.name= sys.intern(name)
         self.room_reserved= room_reserved
-        self.check_in= date1
-        self.check_out= date2
+        self.check_in_ordinal= date1.toordinal()
+        self.check_out_ordinal= date2.toordinal()
         self.booking_number= booking_number
         
+        if registry==None:
+            registry= Reservation.booking_numbers
+        
         if self.booking_number== None:
-            self.booking_number= random.randint(1000000000000, 9999999999999)
-            
-            while self.booking_number in Reservation.booking_numbers:
-                self.booking_number= random.randint(1000000000000, 9999999999999)
-            
-            Reservation.booking_numbers.append(self.booking_number)
+            self.booking_number= registry.new_number()
         
         else:
             if type(self.booking_number)!=int:
@@ -51,16 +54,35 @@ class Reservation:
             if len(str(self.booking_number))!=13:
                 raise AssertionError("The booking number must be 13 digits long")
             
-            if self.booking_number in Reservation.booking_numbers:
-                raise AssertionError("The booking number is currently unavailable")
+            registry.claim(self.booking_number)
         
-        for day in range((date2-date1).days):
-            room_reserved.reserve_room(date1+datetime.timedelta(day))
+        try:
+            room_reserved.reserve_range(date1, date2)
         
+        except AssertionError:
+            registry.release(self.booking_number)
+            raise
+        
+    @property
+    def check_in(self):
+        return datetime.date.fromordinal(self.check_in_ordinal)
+    
+    @check_in.setter
+    def check_in(self, date):
+        self.check_in_ordinal= date.toordinal()
+    
+    @property
+    def check_out(self):
+        return datetime.date.fromordinal(self.check_out_ordinal)
+    
+    @check_out.setter
+    def check_out(self, date):
+        self.check_out_ordinal= date.toordinal()
+    
     def __str__(self):
         """
         >>> random.seed(987)
-        >>> Reservation.booking_numbers = []
+        >>> Reservation.booking_numbers = BookingRegistry()
         >>> r1 = Room("Queen", 105, 80.0)
         >>> r1.set_up_room_availability(['May'], 2021)
         >>> date1 = datetime.date(2021, 5, 3)
@@ -84,7 +106,7 @@ class Reservation:
     def to_short_string(self):
         """
         >>> random.seed(987)
-        >>> Reservation.booking_numbers = []
+        >>> Reservation.booking_numbers = BookingRegistry()
         >>> r1 = Room("Queen", 105, 80.0)
         >>> r1.set_up_room_availability(['May'], 2021)
         >>> date1 = datetime.date(2021, 5, 3)
@@ -96,9 +118,9 @@ class Reservation:
         return str(self.booking_number)+"--"+self.name
 
     @classmethod
-    def from_short_string(cls, string, date1, date2, room_reserved):
+    def from_short_string(cls, string, date1, date2, room_reserved, registry=None):
         """
-        >>> Reservation.booking_numbers = []
+        >>> Reservation.booking_numbers = BookingRegistry()
         >>> r1 = Room("Queen", 105, 80.0)
         >>> r1.set_up_room_availability(['May'], 2021)
         >>> date1 = datetime.date(2021, 5, 3)
@@ -117,13 +139,13 @@ class Reservation:
         name= name_and_number[1]
         booking_number=int(name_and_number[0])
         
-        return cls(name, room_reserved, date1, date2, booking_number)
+        return cls(name, room_reserved, date1, date2, booking_number, registry)
 
     @staticmethod
-    def get_reservations_from_row(room_obj, list_tups):
+    def get_reservations_from_row(room_obj, list_tups, registry=None):
         """
         >>> random.seed(987)
-        >>> Reservation.booking_numbers = [] # needs to be reset for the test below to pass
+        >>> Reservation.booking_numbers = BookingRegistry() # needs to be reset for the test below to pass
         >>> r1 = Room("Queen", 105, 80.0)
         >>> r1.set_up_room_availability(MONTHS, 2021)
         >>> rsv_strs =  [(2021, 'May', 3, '1953400675629--Jack'), (2021, 'May', 4, '1953400675629--Jack')]
@@ -135,39 +157,47 @@ class Reservation:
         Check-in date: 2021-05-03
         Check-out date: 2021-05-05
         """
-        new_list=[] 
-        my_dict={}
-        new_dict={}
+        cells=[]
         
-        for tup in list_tups:
+        for year, month, day, short_string in list_tups:
             
-            if len(tup[3])!=0:
-                year, month, day, short_string= tup
-                short_list= short_string.split("--")
-                booking_num, name= short_list
-                new_list.append((year ,month, day, booking_num, name))
+            if len(short_string)!=0:
+                cells.append((CALENDAR.to_ordinal(year, MONTHS.index(month)+1, day), short_string))
         
-        for tup in new_list:
-            
-            if tup[3] in my_dict:
-                my_dict[tup[3]].append(tup)
-            
-            else:
-                my_dict[tup[3]]=[tup]
-        list_dates=[]
+        return Reservation.get_reservations_from_cells(room_obj, cells, registry)
+
+    @staticmethod
+    def get_reservations_from_cells(room_obj, cells, registry=None):
+        """
+        cells are (date ordinal, short string) pairs, one per booked night.
         
-        for key, value in my_dict.items():
-            list_dates=[]
+        >>> r1 = Room("Queen", 105, 80.0)
+        >>> r1.set_up_room_availability(MONTHS, 2021)
+        >>> cells = [(datetime.date(2021, 5, 4).toordinal(), '1953400675629--Jack'), (datetime.date(2021, 5, 3).toordinal(), '1953400675629--Jack')]
+        >>> rsv_dict = Reservation.get_reservations_from_cells(r1, cells, BookingRegistry())
+        >>> rsv = rsv_dict[1953400675629]
+        >>> print(rsv.check_in, rsv.check_out)
+        2021-05-03 2021-05-05
+        """
+        stays={}
+        
+        for night, short_string in cells:
+            booking_num= short_string.split("--")[0]
+            
+            if booking_num not in stays:
+                stays[booking_num]= [short_string, night, night]
             
-            for tup in value:
-                year, month, day, booking_num, name= tup
-                short_string= str(booking_num)+"--"+name
-                int_month= MONTHS.index(month)+1
-                date= datetime.date(tup[0], int_month, tup[2])
-                list_dates.append(date)
+            elif night<stays[booking_num][1]:
+                stays[booking_num][1]= night
             
-            check_in= min(list_dates)
-            check_out= max(list_dates)+ datetime.timedelta(days=1)
-            new_dict[int(key)]= Reservation.from_short_string(short_string, check_in, check_out, room_obj)
+            elif night>stays[booking_num][2]:
+                stays[booking_num][2]= night
+        
+        new_dict={}
+        
+        for booking_num, (short_string, first_night, last_night) in stays.items():
+            check_in= datetime.date.fromordinal(first_night)
+            check_out= datetime.date.fromordinal(last_night+1)
+            new_dict[int(booking_num)]= Reservation.from_short_string(short_string, check_in, check_out, room_obj, registry)
         
         return new_dict
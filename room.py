@@ -1,13 +1,13 @@
 
 
 import datetime
-import doctest
-
-MONTHS = ['Jan', 'Feb', 'Mar', 'Apr', 'May', 'Jun', 'Jul', 'Aug', 'Sep', 'Oct', 'Nov', 'Dec']
-DAYS_PER_MONTH = [31, 28, 31, 30, 31, 30, 31, 31, 30, 31, 30, 31]
+import sys
+from availability import Availability
+from calendar_table import CALENDAR, MONTHS, DAYS_PER_MONTH
 
 
 class Room:
+    __slots__= ('room_type', 'room_num', 'price', 'availability')
     TYPES_OF_ROOMS_AVAILABLE= ['twin', 'double', 'queen', 'king']
     
     def __init__(self, room_type, room_num, price):
@@ -23,10 +23,10 @@ class Room:
         if price<0:
             raise AssertionError("The price cannot be negative.")
         
-        self.room_type= room_type
+        self.room_type= sys.intern(room_type)
         self.room_num= room_num
         self.price= price
-        self.availability={}
+        self.availability=Availability()
                 
     def __str__(self):
         return "Room "+str(self.room_num)+","+self.room_type+","+str(self.price)
@@ -49,23 +49,12 @@ class Room:
         >>> len(r.availability[(1600, 2)])
         30
         """
-        DAYS_PER_MONTH_copy=[]
-        for days in DAYS_PER_MONTH:
-            DAYS_PER_MONTH_copy.append(days)
-        
-        if year/4==year//4:
-            DAYS_PER_MONTH_copy[1]=29
-        
-        if str(year)[-2:]=="00":
-            if year/400!=year//400:
-                DAYS_PER_MONTH_copy[1]=28
-        
         for i, month in enumerate(MONTHS):
             
             if month not in months_list:
                 continue
-            month_tuple= year, i+1
-            self.availability[month_tuple]=[None]+[True]*DAYS_PER_MONTH_copy[i]
+            
+            self.availability.set_up_month(year, i+1, CALENDAR.month_length(year, i+1))
 
     def reserve_room(self, date):
         """
@@ -89,6 +78,32 @@ class Room:
         
         dates_available[date.day]= False
 
+    def reserve_range(self, date1, date2):
+        """
+        >>> r = Room("Queen", 105, 80.0)
+        >>> r.set_up_room_availability(['May', 'Jun'], 2021)
+        >>> r.reserve_range(datetime.date(2021, 5, 30), datetime.date(2021, 6, 2))
+        >>> r.availability[(2021, 5)][31], r.availability[(2021, 6)][1], r.availability[(2021, 6)][2]
+        (False, False, True)
+        >>> r.reserve_range(datetime.date(2021, 6, 1), datetime.date(2021, 6, 5))
+        Traceback (most recent call last):
+        AssertionError: The room is not available at the given dates
+        """
+        self.availability.reserve(date1.toordinal(), date2.toordinal())
+
+    def release_range(self, date1, date2):
+        """
+        >>> r = Room("Queen", 105, 80.0)
+        >>> r.set_up_room_availability(['May', 'Jun'], 2021)
+        >>> date1 = datetime.date(2021, 5, 30)
+        >>> date2 = datetime.date(2021, 6, 2)
+        >>> r.reserve_range(date1, date2)
+        >>> r.release_range(date1, date2)
+        >>> r.is_available(date1, date2)
+        True
+        """
+        self.availability.release(date1.toordinal(), date2.toordinal())
+
     def make_available(self, date):
         """
         >>> r = Room("Queen", 105, 80.0)
@@ -138,17 +153,7 @@ class Room:
         if date1>=date2:
             raise AssertionError("The first date is not an earlier date than the second")
         
-        date= date1
-        while date<date2:
-            if(date.year, date.month) not in self.availability:
-                return False
-            
-            elif not self.availability[(date.year, date.month)][date.day]:
-                return False
-            
-            date= date + datetime.timedelta(days=1)
-        
-        return True
+        return self.availability.is_free(date1.toordinal(), date2.toordinal())
     
     @staticmethod
     def find_available_room(rooms, room_type, date1, date2):
@@ -186,19 +191,12 @@ class Room:
         if date1>date2:
             raise AssertionError("The first date is not an earlier date than the second")
         
-        correct_type=[]
         for room in rooms:
+            
             if room.room_type!=room_type:
                 continue
-            correct_type.append(room)
-        
-        available_rooms=[]
-        
-        for room in correct_type:
+            
             if room.is_available(date1, date2):
-                available_rooms.append(room)
-        
-        if len(available_rooms)==0:
-            return None
+                return room
         
-        return available_rooms[0]
+        return None
@@ -0,0 +1,303 @@
+import argparse
+import asyncio
+import datetime
+import json
+import urllib.parse
+from booking import Booking
+from replay import ReplayDriver
+
+REASONS= {200: 'OK', 400: 'Bad Request', 404: 'Not Found', 405: 'Method Not Allowed'}
+
+
+class BookingServer:
+    """
+    Local HTTP/JSON front-end over one loaded booking system.
+
+        POST /reserve       {"hotel", "name", "room_type", "check_in", "check_out"}
+        POST /cancel        {"booking"}
+        GET  /lookup        ?booking=  or  ?hotel=&name=  or  ?hotel=&room=&check_in=
+        GET  /availability  ?check_in=&check_out=[&room_types=Queen,King]
+
+    Writes to a hotel go through that hotel's queue and are applied one at a
+    time by its worker task; reads are answered straight away. Touched hotels
+    are persisted every persist_every seconds by a background task, through
+    the same queue, with the file writing done in a worker thread. All months
+    are kept loaded so that reads never change a hotel.
+
+    >>> import random
+    >>> random.seed(987)
+    >>> async def session():
+    ...     server = BookingServer(Booking.load_system())
+    ...     listener = await server.start(port=0)
+    ...     port = listener.sockets[0].getsockname()[1]
+    ...     made = await fetch(port, 'POST', '/reserve', {'hotel': 'Overlook Hotel', 'name': 'Wendy',
+    ...                        'room_type': 'Queen', 'check_in': '1975-12-20', 'check_out': '1975-12-22'})
+    ...     print(made[0], made[1]['room'], made[1]['total'])
+    ...     found = await fetch(port, 'GET', '/lookup?hotel=Overlook+Hotel&name=wendy')
+    ...     print(found[1]['bookings'] == [made[1]['booking']])
+    ...     print(await fetch(port, 'POST', '/cancel', {'booking': 123}))
+    ...     print(await fetch(port, 'POST', '/reserve', {'hotel': ['x']}))
+    ...     print((await fetch(port, 'POST', '/cancel', {'booking': made[1]['booking']}))[0])
+    ...     found = await fetch(port, 'GET', '/availability?check_in=1975-12-20&check_out=1975-12-27&room_types=Twin')
+    ...     print(found[1]['Overlook Hotel'])
+    ...     print(await fetch(port, 'GET', '/availability?check_in=1975-12-27&check_out=1975-12-20'))
+    ...     print(await fetch(port, 'GET', '/nowhere'))
+    ...     await server.stop()
+    >>> asyncio.run(session())
+    200 3 252.2
+    True
+    (400, {'op': 'cancel', 'ok': False, 'error': 'No reservation was found with that booking number'})
+    (400, {'op': 'make', 'ok': False, 'error': 'The hotel must be given by name'})
+    200
+    {'Twin': [0, None]}
+    (400, {'ok': False, 'error': 'The first date is not an earlier date than the second'})
+    (404, {'ok': False, 'error': 'Not found: /nowhere'})
+    """
+    def __init__(self, booking, persist_every=1.0):
+        self.booking= booking
+        self.persist_every= persist_every
+        self.driver= ReplayDriver(booking)
+        self.hotels= {hotel_obj.name: hotel_obj for hotel_obj in booking.hotels}
+        self.queues= {}
+        self.tasks= []
+        self.listener= None
+
+        for hotel_obj in booking.hotels:
+            hotel_obj.load_all_months()
+
+    async def start(self, host='127.0.0.1', port=8080):
+        for hotel_obj in self.booking.hotels:
+            queue= asyncio.Queue()
+            self.queues[hotel_obj.name]= queue
+            self.tasks.append(asyncio.create_task(self.worker(queue)))
+
+        self.tasks.append(asyncio.create_task(self.persister()))
+        self.listener= await asyncio.start_server(self.handle, host, port)
+
+        return self.listener
+
+    async def stop(self):
+        self.listener.close()
+        await self.listener.wait_closed()
+        await self.flush()
+
+        for task in self.tasks:
+            task.cancel()
+
+        await asyncio.gather(*self.tasks, return_exceptions=True)
+        self.tasks= []
+
+    async def worker(self, queue):
+        while True:
+            job, future= await queue.get()
+
+            try:
+                result= job()
+
+                if asyncio.isfuture(result):
+                    result= await result
+
+                future.set_result(result)
+
+            except Exception as error:
+                future.set_exception(error)
+
+    def write(self, hotel_obj, job):
+        future= asyncio.get_running_loop().create_future()
+        self.queues[hotel_obj.name].put_nowait((job, future))
+
+        return future
+
+    async def persister(self):
+        while True:
+            await asyncio.sleep(self.persist_every)
+            await self.flush()
+
+    async def flush(self):
+        loop= asyncio.get_running_loop()
+        touched= self.driver.touched
+        self.driver.touched= set()
+        pending= []
+
+        for hotel_obj in touched:
+            pending.append(self.write(hotel_obj, lambda hotel_obj=hotel_obj: loop.run_in_executor(None, hotel_obj.persist)))
+
+        await asyncio.gather(*pending)
+
+    async def handle(self, reader, writer):
+        try:
+            while True:
+                request_line= await reader.readline()
+
+                if request_line==b'':
+                    break
+
+                headers= {}
+                line= await reader.readline()
+
+                while line not in (b'\r\n', b'\n', b''):
+                    key, colon, value= line.decode('latin-1').partition(':')
+                    headers[key.strip().lower()]= value.strip()
+                    line= await reader.readline()
+
+                parts= request_line.decode('latin-1').split()
+
+                if len(parts)!=3:
+                    await BookingServer.respond(writer, 400, {'ok': False, 'error': 'Malformed request line'}, False)
+                    break
+
+                method, target, version= parts
+                length= int(headers.get('content-length', '0'))
+                body= await reader.readexactly(length) if length>0 else b''
+                status, payload= await self.dispatch(method, target, body)
+                keep_alive= version=='HTTP/1.1' and headers.get('connection', '').lower()!='close'
+                await BookingServer.respond(writer, status, payload, keep_alive)
+
+                if not keep_alive:
+                    break
+
+        except (ValueError, asyncio.IncompleteReadError, ConnectionError):
+            pass
+
+        finally:
+            writer.close()
+
+    @staticmethod
+    async def respond(writer, status, payload, keep_alive):
+        data= json.dumps(payload).encode('utf-8')
+        head= 'HTTP/1.1 '+str(status)+' '+REASONS[status]+'\r\n'
+        head+= 'Content-Type: application/json\r\n'
+        head+= 'Content-Length: '+str(len(data))+'\r\n'
+        head+= 'Connection: '+('keep-alive' if keep_alive else 'close')+'\r\n\r\n'
+        writer.write(head.encode('latin-1')+data)
+        await writer.drain()
+
+    async def dispatch(self, method, target, body):
+        url= urllib.parse.urlsplit(target)
+        routes= {'/reserve': ('POST', self.reserve),
+                 '/cancel': ('POST', self.cancel),
+                 '/lookup': ('GET', self.lookup),
+                 '/availability': ('GET', self.availability)}
+
+        if url.path not in routes:
+            return 404, {'ok': False, 'error': 'Not found: '+url.path}
+
+        allowed, route= routes[url.path]
+
+        if method!=allowed:
+            return 405, {'ok': False, 'error': 'Use '+allowed+' for '+url.path}
+
+        if method=='POST':
+            try:
+                request= json.loads(body or b'{}')
+
+            except ValueError:
+                return 400, {'ok': False, 'error': 'The body is not JSON'}
+
+            if not isinstance(request, dict):
+                return 400, {'ok': False, 'error': 'The body is not a JSON object'}
+
+        else:
+            request= dict(urllib.parse.parse_qsl(url.query))
+
+        result= await route(request)
+
+        return (200 if result.get('ok', True) else 400), result
+
+    async def reserve(self, request):
+        request= dict(request, op='make')
+
+        if not isinstance(request.get('hotel'), str):
+            return self.driver.apply(dict(request, error='The hotel must be given by name'))
+
+        hotel_obj= self.hotels.get(request['hotel'])
+
+        if hotel_obj==None:
+            return self.driver.apply(request)
+
+        return await self.write(hotel_obj, lambda: self.driver.apply(request))
+
+    async def cancel(self, request):
+        request= dict(request, op='cancel')
+
+        try:
+            hotel_obj= self.booking.find_reservation(int(request.get('booking')))[0]
+
+        except (TypeError, ValueError):
+            hotel_obj= None
+
+        if hotel_obj==None:
+            return self.driver.apply(request)
+
+        return await self.write(hotel_obj, lambda: self.driver.apply(request))
+
+    async def lookup(self, request):
+        return self.driver.apply(dict(request, op='lookup'))
+
+    async def availability(self, request):
+        try:
+            check_in= datetime.date.fromisoformat(request['check_in'])
+            check_out= datetime.date.fromisoformat(request['check_out'])
+
+        except (KeyError, ValueError):
+            return {'ok': False, 'error': 'check_in and check_out must be YYYY-MM-DD dates'}
+
+        room_types= None
+
+        if request.get('room_types'):
+            room_types= request['room_types'].split(',')
+
+        try:
+            return self.booking.search_availability(check_in, check_out, room_types)
+
+        except AssertionError as error:
+            return {'ok': False, 'error': str(error)}
+
+
+async def fetch(port, method, path, payload=None, host='127.0.0.1'):
+    """
+    Sends one request to a BookingServer and returns (status, decoded JSON).
+    """
+    reader, writer= await asyncio.open_connection(host, port)
+    data= b'' if payload==None else json.dumps(payload).encode('utf-8')
+    head= method+' '+path+' HTTP/1.1\r\nHost: '+host+'\r\nConnection: close\r\n'
+    head+= 'Content-Length: '+str(len(data))+'\r\n\r\n'
+    writer.write(head.encode('latin-1')+data)
+    await writer.drain()
+    response= await reader.read()
+    writer.close()
+    await writer.wait_closed()
+    head, separator, body= response.partition(b'\r\n\r\n')
+
+    return int(head.split()[1]), json.loads(body)
+
+
+async def serve(host, port, persist_every, journal):
+    booking= Booking.load_system(journal=journal)
+    server= BookingServer(booking, persist_every)
+    listener= await server.start(host, port)
+
+    try:
+        await listener.serve_forever()
+
+    finally:
+        await server.stop()
+
+
+def main(argv=None):
+    parser= argparse.ArgumentParser(description="Serve the booking system over HTTP/JSON.")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8080)
+    parser.add_argument('--persist-every', type=float, default=1.0, help="seconds between background saves")
+    parser.add_argument('--journal', action='store_true', help="journal changes instead of rewriting month files")
+    args= parser.parse_args(argv)
+
+    try:
+        asyncio.run(serve(args.host, args.port, args.persist_every, args.journal))
+
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__=='__main__':
+    main()
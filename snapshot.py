@@ -0,0 +1,167 @@
+import datetime
+import mmap
+import struct
+
+MAGIC= b'HBSN'
+VERSION= 1
+
+HEADER= struct.Struct('<4sHHIIIIII')
+STRING= struct.Struct('<II')
+MONTH= struct.Struct('<HBx')
+ROOM= struct.Struct('<IHxxd')
+RESERVATION= struct.Struct('<QIIIII')
+INDEX= struct.Struct('<I')
+
+
+def build_snapshot(name, months, rooms, reservations):
+    """
+    Packs a hotel into the binary snapshot layout: a header, the room type
+    table, the set-up months, the room table, the reservation table (in the
+    hotel's order), an index of the reservations sorted by booking number
+    and a string pool holding the hotel name, room types and guest names.
+
+    rooms is a list of (room_num, room_type, price) and reservations a list
+    of (booking_num, room_index, check_in, check_out, name).
+    """
+    pool= bytearray()
+    offsets= {}
+
+    def add_string(text):
+        if text not in offsets:
+            data= text.encode('utf-8')
+            offsets[text]= (len(pool), len(data))
+            pool.extend(data)
+
+        return offsets[text]
+
+    name_offset, name_len= add_string(name)
+    types= []
+
+    for room_num, room_type, price in rooms:
+
+        if room_type not in types:
+            types.append(room_type)
+
+    parts= []
+
+    for room_type in types:
+        parts.append(STRING.pack(*add_string(room_type)))
+
+    for year, month in months:
+        parts.append(MONTH.pack(year, month))
+
+    for room_num, room_type, price in rooms:
+        parts.append(ROOM.pack(room_num, types.index(room_type), price))
+
+    for booking_num, room_index, check_in, check_out, guest in reservations:
+        guest_offset, guest_len= add_string(guest)
+        parts.append(RESERVATION.pack(booking_num, room_index, check_in.toordinal(), check_out.toordinal(), guest_offset, guest_len))
+
+    order= sorted(range(len(reservations)), key=lambda i: reservations[i][0])
+
+    for i in order:
+        parts.append(INDEX.pack(i))
+
+    header= HEADER.pack(MAGIC, VERSION, len(types), len(rooms), len(reservations), len(months), len(pool), name_offset, name_len)
+
+    return header+b''.join(parts)+bytes(pool)
+
+
+class HotelSnapshot:
+    """
+    Read-only view of a snapshot file through mmap. Rooms and reservations
+    are decoded on access, and find() binary-searches the booking number
+    index, so lookups work without building Room or Reservation objects.
+
+    >>> import os, tempfile
+    >>> folder = tempfile.TemporaryDirectory()
+    >>> filename = os.path.join(folder.name, 'snapshot.bin')
+    >>> rooms = [(101, 'Twin', 55.0), (105, 'Queen', 80.0)]
+    >>> rsvs = [(4191471513010, 1, datetime.date(2021, 5, 3), datetime.date(2021, 5, 10), 'Mrs. Santos'),
+    ...         (1953400675629, 0, datetime.date(2021, 5, 1), datetime.date(2021, 5, 2), 'Jack')]
+    >>> with open(filename, 'wb') as fobj:
+    ...     _ = fobj.write(build_snapshot('Secret Nugget Hotel', [(2021, 5)], rooms, rsvs))
+    >>> snap = HotelSnapshot(filename)
+    >>> snap.name, snap.months(), snap.room(1)
+    ('Secret Nugget Hotel', [(2021, 5)], (105, 'Queen', 80.0))
+    >>> snap.find(4191471513010)
+    (4191471513010, 1, datetime.date(2021, 5, 3), datetime.date(2021, 5, 10), 'Mrs. Santos')
+    >>> print(snap.find(123))
+    None
+    >>> snap.close()
+    >>> folder.cleanup()
+    """
+    def __init__(self, filename):
+        self.fobj= open(filename, 'rb')
+        self.data= mmap.mmap(self.fobj.fileno(), 0, access=mmap.ACCESS_READ)
+        fields= HEADER.unpack_from(self.data, 0)
+        magic, version, self.type_count, self.room_count, self.reservation_count, self.month_count, pool_len, name_offset, name_len= fields
+
+        if magic!=MAGIC or version!=VERSION:
+            self.close()
+            raise AssertionError("Not a hotel snapshot file")
+
+        self.types_at= HEADER.size
+        self.months_at= self.types_at+self.type_count*STRING.size
+        self.rooms_at= self.months_at+self.month_count*MONTH.size
+        self.reservations_at= self.rooms_at+self.room_count*ROOM.size
+        self.index_at= self.reservations_at+self.reservation_count*RESERVATION.size
+        self.pool_at= self.index_at+self.reservation_count*INDEX.size
+        self.name= self.string(name_offset, name_len)
+        self.types= [self.string(*STRING.unpack_from(self.data, self.types_at+i*STRING.size)) for i in range(self.type_count)]
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def __len__(self):
+        return self.reservation_count
+
+    def string(self, offset, length):
+        start= self.pool_at+offset
+        return self.data[start:start+length].decode('utf-8')
+
+    def months(self):
+        return [MONTH.unpack_from(self.data, self.months_at+i*MONTH.size) for i in range(self.month_count)]
+
+    def room(self, index):
+        room_num, type_code, price= ROOM.unpack_from(self.data, self.rooms_at+index*ROOM.size)
+        return room_num, self.types[type_code], price
+
+    def reservation(self, index):
+        fields= RESERVATION.unpack_from(self.data, self.reservations_at+index*RESERVATION.size)
+        booking_num, room_index, check_in, check_out, name_offset, name_len= fields
+        check_in= datetime.date.fromordinal(check_in)
+        check_out= datetime.date.fromordinal(check_out)
+
+        return booking_num, room_index, check_in, check_out, self.string(name_offset, name_len)
+
+    def booking_number_at(self, position):
+        index= INDEX.unpack_from(self.data, self.index_at+position*INDEX.size)[0]
+        return RESERVATION.unpack_from(self.data, self.reservations_at+index*RESERVATION.size)[0], index
+
+    def find(self, booking_num):
+        lo, hi= 0, self.reservation_count
+
+        while lo<hi:
+            mid= (lo+hi)//2
+
+            if self.booking_number_at(mid)[0]<booking_num:
+                lo= mid+1
+
+            else:
+                hi= mid
+
+        if lo<self.reservation_count:
+            number, index= self.booking_number_at(lo)
+
+            if number==booking_num:
+                return self.reservation(index)
+
+        return None
+
+    def close(self):
+        self.data.close()
+        self.fobj.close()
@@ -0,0 +1,252 @@
+import argparse
+import datetime
+import os
+import sqlite3
+import threading
+from hotel import Hotel
+from room import Room, MONTHS
+from registry import BookingRegistry
+from reservation import Reservation
+
+
+class CsvStorage:
+    """
+    The default storage: hotel_info.txt plus one CSV file per month under
+    hotels/<folder>/. Changes are written by rewriting the dirty months when
+    the hotel is saved, so individual operations write nothing.
+    """
+    def folders(self):
+        return os.listdir('hotels')
+
+    def load(self, folder, registry=None, lazy=False, max_months=12):
+        return Hotel.load_hotel(folder, registry, lazy, max_months)
+
+    def save(self, hotel):
+        hotel.save_month_files()
+
+    def record_make(self, hotel, reservations):
+        pass
+
+    def record_cancel(self, hotel, reservations):
+        pass
+
+
+class SqliteStorage:
+    """
+    Hotels kept in one SQLite database. Each reservation made or cancelled is
+    written in its own transaction as it happens, so saving a hotel only
+    refreshes its rooms and months. Reservations are indexed by guest name
+    and by (room, check-in, check-out), so find_by_guest() and find_by_stay()
+    answer without loading the hotel. Hotels are always loaded whole, so
+    load() ignores lazy.
+
+    >>> import random, tempfile
+    >>> random.seed(987)
+    >>> folder = tempfile.TemporaryDirectory()
+    >>> storage = SqliteStorage(os.path.join(folder.name, 'hotels.db'))
+    >>> storage.import_csv('overlook_hotel')
+    1
+    >>> hotel = Hotel.load_hotel('overlook_hotel', storage=storage)
+    >>> hotel.name, len(hotel.rooms), len(hotel.rooms[0].availability), len(hotel.reservations)
+    ('Overlook Hotel', 500, 12, 1)
+    >>> num = hotel.make_reservation('Wendy', 'Queen', datetime.date(1975, 12, 20), datetime.date(1975, 12, 22))
+    >>> storage.find_by_guest('overlook_hotel', ' WENDY') == [(num, 3, 'Wendy', datetime.date(1975, 12, 20), datetime.date(1975, 12, 22))]
+    True
+    >>> storage.find_by_stay('overlook_hotel', 237, datetime.date(1975, 11, 15))
+    (9998701091820, 237, 'Jack', datetime.date(1975, 10, 30), datetime.date(1975, 12, 24))
+    >>> hotel.cancel_reservation(9998701091820)
+    >>> print(storage.find_by_stay('overlook_hotel', 237, datetime.date(1975, 11, 15)))
+    None
+    >>> hotel.save_hotel()
+    >>> again = Hotel.load_hotel('overlook_hotel', storage=storage)
+    >>> list(again.reservations) == [num]
+    True
+    >>> list(Hotel.load_hotel('overlook_hotel', storage=storage).reservations) == [num]
+    True
+    >>> from booking import Booking
+    >>> [hotel.name for hotel in Booking.load_system(storage=storage).hotels]
+    ['Overlook Hotel']
+    >>> storage.close()
+    >>> folder.cleanup()
+    """
+    SCHEMA= '''
+        CREATE TABLE IF NOT EXISTS hotels (
+            folder TEXT PRIMARY KEY,
+            name TEXT NOT NULL);
+        CREATE TABLE IF NOT EXISTS rooms (
+            folder TEXT NOT NULL REFERENCES hotels(folder),
+            position INTEGER NOT NULL,
+            room_num INTEGER NOT NULL,
+            room_type TEXT NOT NULL,
+            price REAL NOT NULL,
+            PRIMARY KEY (folder, room_num));
+        CREATE TABLE IF NOT EXISTS months (
+            folder TEXT NOT NULL REFERENCES hotels(folder),
+            year INTEGER NOT NULL,
+            month INTEGER NOT NULL,
+            PRIMARY KEY (folder, year, month));
+        CREATE TABLE IF NOT EXISTS reservations (
+            booking_number INTEGER PRIMARY KEY,
+            folder TEXT NOT NULL REFERENCES hotels(folder),
+            room_num INTEGER NOT NULL,
+            name TEXT NOT NULL,
+            guest TEXT NOT NULL,
+            check_in INTEGER NOT NULL,
+            check_out INTEGER NOT NULL);
+        CREATE INDEX IF NOT EXISTS reservations_by_guest ON reservations (folder, guest);
+        CREATE INDEX IF NOT EXISTS reservations_by_stay ON reservations (folder, room_num, check_in, check_out);
+    '''
+
+    def __init__(self, filename):
+        self.filename= filename
+        self.connection= sqlite3.connect(filename, check_same_thread=False)
+        self.lock= threading.Lock()
+
+        with self.lock, self.connection:
+            self.connection.execute('PRAGMA journal_mode=WAL')
+            self.connection.executescript(SqliteStorage.SCHEMA)
+
+    def close(self):
+        self.connection.close()
+
+    def folders(self):
+        return [row[0] for row in self.connection.execute('SELECT folder FROM hotels ORDER BY folder')]
+
+    def load(self, folder, registry=None, lazy=False, max_months=12):
+        row= self.connection.execute('SELECT name FROM hotels WHERE folder=?', (folder,)).fetchone()
+
+        if row==None:
+            raise KeyError(folder)
+
+        if registry==None:
+            registry= BookingRegistry()
+
+        rooms= {}
+        room_objects= []
+
+        for room_num, room_type, price in self.connection.execute('SELECT room_num, room_type, price FROM rooms WHERE folder=? ORDER BY position', (folder,)):
+            room_obj= Room(room_type, room_num, price)
+            rooms[room_num]= room_obj
+            room_objects.append(room_obj)
+
+        months_by_year= {}
+
+        for year, month in self.connection.execute('SELECT year, month FROM months WHERE folder=? ORDER BY year, month', (folder,)):
+            months_by_year.setdefault(year, []).append(MONTHS[month-1])
+
+        for room_obj in room_objects:
+
+            for year, months in months_by_year.items():
+                room_obj.set_up_room_availability(months, year)
+
+        rsvs= {}
+        query= 'SELECT booking_number, room_num, name, check_in, check_out FROM reservations WHERE folder=? ORDER BY room_num, check_in'
+
+        for booking_num, room_num, name, check_in, check_out in self.connection.execute(query, (folder,)):
+            check_in= datetime.date.fromordinal(check_in)
+            check_out= datetime.date.fromordinal(check_out)
+            rsvs[booking_num]= Reservation(name, rooms[room_num], check_in, check_out, booking_num, registry)
+
+        hotel= Hotel(row[0], room_objects, rsvs, registry)
+        hotel.storage= self
+        hotel.info_saved= True
+
+        return hotel
+
+    def save(self, hotel):
+        with self.lock, self.connection:
+            self.write_hotel(hotel)
+
+        hotel.info_saved= True
+
+    def write_hotel(self, hotel):
+        folder= hotel.folder_name()
+        months= set()
+
+        for room_obj in hotel.rooms:
+            months.update(room_obj.availability)
+
+        self.connection.execute('INSERT OR REPLACE INTO hotels (folder, name) VALUES (?, ?)', (folder, hotel.name))
+        self.connection.executemany('INSERT OR REPLACE INTO rooms (folder, position, room_num, room_type, price) VALUES (?, ?, ?, ?, ?)',
+                                    [(folder, i, room_obj.room_num, room_obj.room_type, room_obj.price) for i, room_obj in enumerate(hotel.rooms)])
+        self.connection.executemany('INSERT OR IGNORE INTO months (folder, year, month) VALUES (?, ?, ?)',
+                                    [(folder, year, month) for year, month in sorted(months)])
+
+    @staticmethod
+    def reservation_row(folder, reservation):
+        return (reservation.booking_number, folder, reservation.room_reserved.room_num, reservation.name,
+                Hotel.normalize_name(reservation.name), reservation.check_in_ordinal, reservation.check_out_ordinal)
+
+    def record_make(self, hotel, reservations):
+        folder= hotel.folder_name()
+
+        with self.lock, self.connection:
+            self.connection.executemany('INSERT INTO reservations VALUES (?, ?, ?, ?, ?, ?, ?)',
+                                        [SqliteStorage.reservation_row(folder, reservation) for reservation in reservations])
+
+    def record_cancel(self, hotel, reservations):
+        with self.lock, self.connection:
+            self.connection.executemany('DELETE FROM reservations WHERE booking_number=?',
+                                        [(reservation.booking_number,) for reservation in reservations])
+
+    def import_hotel(self, hotel):
+        folder= hotel.folder_name()
+
+        with self.lock, self.connection:
+
+            for table in ('reservations', 'months', 'rooms', 'hotels'):
+                self.connection.execute('DELETE FROM '+table+' WHERE folder=?', (folder,))
+
+            self.write_hotel(hotel)
+            self.connection.executemany('INSERT INTO reservations VALUES (?, ?, ?, ?, ?, ?, ?)',
+                                        [SqliteStorage.reservation_row(folder, reservation) for reservation in hotel.reservations.values()])
+
+    def import_csv(self, *folders):
+        if len(folders)==0:
+            folders= os.listdir('hotels')
+
+        for folder in folders:
+            self.import_hotel(Hotel.load_hotel(folder))
+
+        return len(folders)
+
+    @staticmethod
+    def found(row):
+        booking_num, room_num, name, check_in, check_out= row
+
+        return booking_num, room_num, name, datetime.date.fromordinal(check_in), datetime.date.fromordinal(check_out)
+
+    def find_by_guest(self, folder, name):
+        query= 'SELECT booking_number, room_num, name, check_in, check_out FROM reservations WHERE folder=? AND guest=? ORDER BY check_in'
+        rows= self.connection.execute(query, (folder, Hotel.normalize_name(name)))
+
+        return [SqliteStorage.found(row) for row in rows]
+
+    def find_by_stay(self, folder, room_num, date):
+        query= 'SELECT booking_number, room_num, name, check_in, check_out FROM reservations WHERE folder=? AND room_num=? AND check_in<=? AND check_out>? ORDER BY check_in DESC LIMIT 1'
+        night= date.toordinal()
+        row= self.connection.execute(query, (folder, room_num, night, night)).fetchone()
+
+        if row==None:
+            return None
+
+        return SqliteStorage.found(row)
+
+
+def main(argv=None):
+    parser= argparse.ArgumentParser(description="Import the hotels/<name>/*.csv tree into an SQLite database.")
+    parser.add_argument('database', help="SQLite file to create or update")
+    parser.add_argument('folders', nargs='*', help="hotel folders to import (default: all of hotels/)")
+    args= parser.parse_args(argv)
+
+    storage= SqliteStorage(args.database)
+
+    try:
+        print('Imported '+str(storage.import_csv(*args.folders))+' hotels into '+args.database)
+
+    finally:
+        storage.close()
+
+
+if __name__=='__main__':
+    main()